@@ -0,0 +1,285 @@
+"""
+Local stand-ins for the services the assistant calls.
+
+A single threaded HTTP server emulates the OpenAI chat completions API
+(including streaming and tool calls), Groq transcriptions, TTS OpenAI, and
+the Nominatim and Open-Meteo endpoints used by the weather tool. Every
+service has a latency profile with jitter and an error rate, so slow or
+failing dependencies can be reproduced without network access.
+"""
+
+import json
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+@dataclass
+class ServiceProfile:
+    """Latency in seconds before the first byte, and per streamed token."""
+
+    latency: float = 0.1
+    jitter: float = 0.2
+    token_delay: float = 0.0
+    error_rate: float = 0.0
+
+    def delay(self, value):
+        if value > 0:
+            time.sleep(max(0.0, random.gauss(value, value * self.jitter)))
+
+    def fails(self):
+        return random.random() < self.error_rate
+
+
+def default_profiles():
+    return {
+        "llm": ServiceProfile(latency=0.35, token_delay=0.01),
+        "stt": ServiceProfile(latency=0.3),
+        "tts": ServiceProfile(latency=0.3),
+        "geocode": ServiceProfile(latency=0.1),
+        "weather": ServiceProfile(latency=0.1),
+    }
+
+
+@dataclass
+class Script:
+    """What the fake services answer in the current turn."""
+
+    transcript: str = "Wie spät ist es?"
+    answer: str = "Es ist kurz nach drei. Zeit für einen Kaffee, oder?"
+    tool_pattern: str = r"\bwetter\b|\bweather\b"
+    tool_location: str = "Berlin"
+    counter: int = field(default=0)
+
+
+class FakeServices:
+    """
+    Run the fake services on a local port.
+
+    Use `environment()` and `patch()` to point the assistant at them.
+    """
+
+    def __init__(self, profiles=None, host="127.0.0.1", port=0):
+        self.profiles = profiles or default_profiles()
+        self.script = Script()
+        self.requests = {name: 0 for name in self.profiles}
+        self.errors = {name: 0 for name in self.profiles}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def environment(self):
+        """Environment variables that point the SDK clients at the fakes."""
+        return {
+            "OPENAI_API_KEY": "benchmark",
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "GROQ_API_KEY": "benchmark",
+            "GROQ_BASE_URL": self.url,
+        }
+
+    def patch(self):
+        """Point the plain HTTP clients of the assistant at the fakes."""
+        from core.text_to_speech import TextToSpeech
+        from core.tools import Tools
+
+        TextToSpeech.TTSOPENAI_URL = f"{self.url}/tts"
+        Tools.WEATHER_URL = f"{self.url}/weather"
+        Tools.GEOCODE_URL = f"{self.url}/geocode"
+
+    def _count(self, service, error):
+        with self._lock:
+            self.requests[service] += 1
+            if error:
+                self.errors[service] += 1
+
+    def _handler_class(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                if self.path.startswith("/geocode"):
+                    self._serve("geocode", self._geocode)
+                elif self.path.startswith("/weather"):
+                    self._serve("weather", self._weather)
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self.body = self.rfile.read(length)
+                if self.path.endswith("/chat/completions"):
+                    self._serve("llm", self._chat)
+                elif self.path.endswith("/audio/transcriptions"):
+                    self._serve("stt", self._transcription)
+                elif self.path.startswith("/tts"):
+                    self._serve("tts", self._tts)
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def _serve(self, service, handler):
+                profile = services.profiles[service]
+                profile.delay(profile.latency)
+                error = profile.fails()
+                services._count(service, error)
+                if error:
+                    self._send_json(
+                        500, {"error": {"message": "Injected error", "type": "server_error"}}
+                    )
+                else:
+                    handler(profile)
+
+            def _send_json(self, status, data):
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _write_chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _transcription(self, profile):
+                self._send_json(200, {"text": services.script.transcript})
+
+            def _tts(self, profile):
+                text = json.loads(self.body)["input"]
+                # Roughly the size of 32 kbit/s MP3 speech at 15 characters/s
+                body = os.urandom(270 * len(text))
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/mpeg")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _geocode(self, profile):
+                self._send_json(200, [{"lat": "52.5170", "lon": "13.3889"}])
+
+            def _weather(self, profile):
+                times = [f"2024-01-01T{hour:02d}:00" for hour in range(24)]
+                self._send_json(
+                    200,
+                    {
+                        "hourly_units": {"temperature_2m": "°C", "precipitation": "mm"},
+                        "hourly": {
+                            "time": times,
+                            "temperature_2m": [round(random.uniform(2, 9), 1) for _ in times],
+                            "precipitation": [
+                                round(random.choice([0, 0, 0, 0.2, 0.6]), 1) for _ in times
+                            ],
+                        },
+                    },
+                )
+
+            def _chat(self, profile):
+                request = json.loads(self.body)
+                message = self._reply(request)
+                if not request.get("stream"):
+                    self._send_json(
+                        200,
+                        {
+                            "id": "chatcmpl-benchmark",
+                            "object": "chat.completion",
+                            "created": int(time.time()),
+                            "model": request["model"],
+                            "choices": [
+                                {"index": 0, "message": message, "finish_reason": "stop"}
+                            ],
+                        },
+                    )
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                if message.get("tool_calls"):
+                    deltas = [
+                        {"tool_calls": [dict(tool_call, index=i)]}
+                        for i, tool_call in enumerate(message["tool_calls"])
+                    ]
+                else:
+                    deltas = [
+                        {"content": token}
+                        for token in re.findall(r"\S+\s*", message["content"])
+                    ]
+                for delta in deltas:
+                    self._write_event(request, delta)
+                    profile.delay(profile.token_delay)
+                self._write_event(request, {}, "stop")
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+            def _write_event(self, request, delta, finish_reason=None):
+                chunk = {
+                    "id": "chatcmpl-benchmark",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": request["model"],
+                    "choices": [
+                        {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                    ],
+                }
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+
+            def _reply(self, request):
+                """Call the weather tool once for weather questions, else answer."""
+                messages = request["messages"]
+                user = next(
+                    (m for m in reversed(messages) if m["role"] == "user"), {}
+                )
+                answered = messages and messages[-1]["role"] == "tool"
+                wants_tool = re.search(
+                    services.script.tool_pattern, user.get("content") or "", re.I
+                )
+                if wants_tool and not answered and request.get("tool_choice") != "none":
+                    arguments = {"location": services.script.tool_location}
+                    return {
+                        "role": "assistant",
+                        "content": None,
+                        "tool_calls": [
+                            {
+                                "id": "call_benchmark",
+                                "type": "function",
+                                "function": {
+                                    "name": "get_weather",
+                                    "arguments": json.dumps(arguments),
+                                },
+                            }
+                        ],
+                    }
+                with services._lock:
+                    services.script.counter += 1
+                    counter = services.script.counter
+                # Vary the answer, so the TTS cache doesn't hide the TTS latency
+                return {
+                    "role": "assistant",
+                    "content": f"{services.script.answer} Antwort {counter}.",
+                }
+
+        return Handler
@@ -0,0 +1,121 @@
+"""Recorded or synthetic utterances that replace the microphone."""
+
+import glob
+import os
+import threading
+import time
+import wave
+
+import numpy as np
+
+RATE = 16000
+
+DEFAULT_PROMPTS = [
+    "Wie wird das Wetter morgen in Berlin?",
+    "Erzähl mir einen Witz über Informatiker.",
+    "Wie spät ist es?",
+    "Was ist die Hauptstadt von Australien?",
+]
+
+
+def synthetic_utterance(words=6, seed=0):
+    """
+    Return 16 kHz samples that the VAD treats like speech: noisy voiced
+    bursts ("words") separated by short gaps, and 1 s of silence at the end.
+    """
+    rng = np.random.default_rng(seed)
+    parts = [rng.normal(0, 30, RATE // 4)]
+    for _ in range(words):
+        length = int(RATE * rng.uniform(0.25, 0.45))
+        t = np.arange(length) / RATE
+        voice = np.sin(2 * np.pi * rng.uniform(110, 220) * t) * np.hanning(length)
+        parts.append(voice * 6000 + rng.normal(0, 300, length))
+        parts.append(rng.normal(0, 30, int(RATE * rng.uniform(0.05, 0.15))))
+    parts.append(rng.normal(0, 30, RATE))
+    return np.clip(np.concatenate(parts), -32768, 32767).astype(np.int16)
+
+
+def load_wav(path):
+    with wave.open(path, "rb") as wav_file:
+        if (
+            wav_file.getframerate() != RATE
+            or wav_file.getnchannels() != 1
+            or wav_file.getsampwidth() != 2
+        ):
+            raise ValueError(f"{path} must be 16 kHz, mono, 16-bit PCM")
+        return np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+
+
+def load_fixtures(folder=None):
+    """
+    Return (samples, transcript) pairs.
+
+    A folder holds `*.wav` files with the transcript in a `.txt` file of the
+    same name. Without a folder, synthetic utterances are used.
+    """
+    if folder is None:
+        return [
+            (synthetic_utterance(words=len(prompt.split()), seed=i), prompt)
+            for i, prompt in enumerate(DEFAULT_PROMPTS)
+        ]
+
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(folder, "*.wav"))):
+        transcript_path = os.path.splitext(path)[0] + ".txt"
+        transcript = DEFAULT_PROMPTS[len(fixtures) % len(DEFAULT_PROMPTS)]
+        if os.path.exists(transcript_path):
+            with open(transcript_path, encoding="utf-8") as file:
+                transcript = file.read().strip()
+        fixtures.append((load_wav(path), transcript))
+    if not fixtures:
+        raise ValueError(f"No WAV fixtures found in {folder}")
+    return fixtures
+
+
+class FakeMicrophone:
+    """
+    PyAudio-style input stream that plays queued utterances in real time.
+
+    Between utterances it returns low background noise. `speed` > 1 delivers
+    audio faster than real time.
+    """
+
+    def __init__(self, speed=1.0, noise=30, seed=0):
+        self.speed = speed
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self.pending = np.zeros(0, dtype=np.int16)
+        self.delivered = 0
+        self.start = None
+        self.finished = threading.Event()
+        self.finished.set()
+        self._lock = threading.Lock()
+
+    def play(self, samples):
+        """Queue an utterance to be 'spoken' into the microphone."""
+        with self._lock:
+            self.pending = np.concatenate([self.pending, samples])
+            self.finished.clear()
+
+    def read(self, frames, exception_on_overflow=True):
+        if self.start is None:
+            self.start = time.perf_counter()
+        # Pace the stream like a real device
+        due = self.start + self.delivered / RATE / self.speed
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        with self._lock:
+            chunk = self.pending[:frames]
+            self.pending = self.pending[frames:]
+            if not len(self.pending):
+                self.finished.set()
+        if len(chunk) < frames:
+            padding = self.rng.normal(0, self.noise, frames - len(chunk))
+            chunk = np.concatenate([chunk, padding.astype(np.int16)])
+        self.delivered += frames
+        return chunk.astype(np.int16).tobytes()
+
+    def close(self):
+        pass
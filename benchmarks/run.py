@@ -0,0 +1,244 @@
+"""
+Offline end-to-end benchmark of the assistant.
+
+Drives `ConversationalAssistant` turns with recorded or synthetic utterances
+against local fake services and reports end-to-end and per-stage latency
+percentiles, CPU time and peak memory. No network access or audio devices
+are needed.
+
+    python -m benchmarks.run --turns 20 --json results.json
+
+The web search tool is not covered, because the search client can't be
+redirected to a local server.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from benchmarks.fake_services import FakeServices, default_profiles
+from benchmarks.fixtures import FakeMicrophone, load_fixtures
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Bytes per second of the audio the fake TTS service returns
+FAKE_AUDIO_BYTES_PER_SECOND = 4000
+
+
+class StubWakeWord:
+    """Stands in for the wake word detector; turns are started directly."""
+
+    inference_times = [0.0]
+
+    def process(self, frame, min_threshold=None):
+        return None
+
+    def reset(self):
+        pass
+
+
+class SilentPlayObject:
+    def __init__(self, duration):
+        self.duration = duration
+        self.stopped = threading.Event()
+
+    def wait_done(self):
+        self.stopped.wait(self.duration)
+
+    def stop(self):
+        self.stopped.set()
+
+
+class NullPlayer:
+    """Plays audio silently, taking `1 / speed` of the real playback time."""
+
+    def __init__(self, speed=0.0):
+        self.speed = speed
+
+    def decode(self, audio_data, format="mp3"):
+        return len(audio_data) / FAKE_AUDIO_BYTES_PER_SECOND
+
+    def play_segment(self, duration, on_done=None):
+        from core.audio.audio_player import Playback
+
+        duration = duration * self.speed
+        return Playback(SilentPlayObject(duration), on_done=on_done)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(percentile(values, 50), 4),
+        "p90": round(percentile(values, 90), 4),
+        "p99": round(percentile(values, 99), 4),
+    }
+
+
+def read_traces(path):
+    """Group the recorded stage durations by stage and by turn."""
+    stages = defaultdict(list)
+    turns = defaultdict(dict)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                record = json.loads(line)
+                stages[record["stage"]].append(record["seconds"])
+                turns[record["turn"]].setdefault(record["stage"], record["seconds"])
+    # Time from the end of the recording until the response is heard
+    stages["response_latency"] = [
+        turn["playback_start"] - turn["recording"]
+        for turn in turns.values()
+        if "playback_start" in turn and "recording" in turn
+    ]
+    return {stage: values for stage, values in stages.items() if values}
+
+
+def resource_usage():
+    if resource is None:
+        return time.process_time(), None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    max_rss = usage.ru_maxrss / 1024  # KiB on Linux
+    if sys.platform == "darwin":
+        max_rss /= 1024  # bytes on macOS
+    return usage.ru_utime + usage.ru_stime, max_rss
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--fixtures", help="Folder with 16 kHz mono WAV files")
+    parser.add_argument(
+        "--latency-scale",
+        type=float,
+        default=1.0,
+        help="Multiply the latency of every fake service",
+    )
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--mic-speed",
+        type=float,
+        default=1.0,
+        help="Feed the utterances faster than real time",
+    )
+    parser.add_argument(
+        "--playback-speed",
+        type=float,
+        default=0.0,
+        help="Fraction of the real playback time to wait (0 skips playback)",
+    )
+    parser.add_argument("--no-streaming", action="store_true")
+    parser.add_argument("--incremental-stt", action="store_true")
+    parser.add_argument("--speculative-tools", action="store_true")
+    parser.add_argument("--json", help="Write the results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    profiles = default_profiles()
+    for profile in profiles.values():
+        profile.latency *= args.latency_scale
+        profile.token_delay *= args.latency_scale
+        profile.jitter = args.jitter
+        profile.error_rate = args.error_rate
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    workdir = tempfile.mkdtemp(prefix="schuai-benchmark-")
+    trace_file = os.path.join(workdir, "traces.jsonl")
+    with FakeServices(profiles) as services:
+        # The clients and the tracer read their configuration on import
+        os.environ.update(services.environment())
+        os.environ.update({"TRACE_OUTPUT": "jsonl", "TRACE_FILE": trace_file})
+        sys.path.insert(0, REPO_ROOT)
+        # Caches and recordings go to a fresh folder
+        os.chdir(workdir)
+
+        from core.audio.audio_recorder import AudioRecorder
+        from core.tracing import tracer
+        from main import ConversationalAssistant
+
+        class BenchmarkRecorder(AudioRecorder):
+            def play_beep(self, duration_ms=100, frequency=500):
+                pass
+
+        services.patch()
+        fixtures = load_fixtures(args.fixtures)
+        microphone = FakeMicrophone(speed=args.mic_speed)
+        assistant = ConversationalAssistant(
+            streaming=not args.no_streaming,
+            incremental_stt=args.incremental_stt,
+            speculative_tools=args.speculative_tools,
+            wake_word=StubWakeWord(),
+            recorder=BenchmarkRecorder(CHUNK=1280, input_stream=microphone),
+            player=NullPlayer(args.playback_speed),
+        )
+
+        cpu_start, _ = resource_usage()
+        wall_start = time.perf_counter()
+        turn_times = []
+        for turn in range(args.turns):
+            samples, transcript = fixtures[turn % len(fixtures)]
+            services.script.transcript = transcript
+            # Skip the audio captured since the last turn, like the wake word loop
+            assistant.recorder.resume_capture()
+            start_time = time.perf_counter()
+            microphone.play(samples)
+            assistant.start_turn()
+            text = assistant.listen()
+            if args.no_streaming:
+                assistant.respond(text)
+            else:
+                assistant.respond_streaming(text)
+            tracer.end_turn()
+            turn_times.append(time.perf_counter() - start_time)
+            print(f"Turn {turn + 1}/{args.turns}: {turn_times[-1]:.2f}s", file=sys.stderr)
+        wall_time = time.perf_counter() - wall_start
+        cpu_end, max_rss = resource_usage()
+
+    stages = {stage: summarize(values) for stage, values in read_traces(trace_file).items()}
+    stages["turn_wall_time"] = summarize(turn_times)
+    results = {
+        "turns": args.turns,
+        "stages": stages,
+        "cpu_seconds": round(cpu_end - cpu_start, 3),
+        "cpu_percent": round(100 * (cpu_end - cpu_start) / wall_time, 1),
+        "max_rss_mb": round(max_rss, 1) if max_rss is not None else None,
+        "requests": services.requests,
+        "injected_errors": services.errors,
+    }
+
+    print(f"{'stage':<28}{'count':>7}{'p50':>9}{'p90':>9}{'p99':>9}")
+    for stage, summary in sorted(stages.items()):
+        print(
+            f"{stage:<28}{summary['count']:>7}"
+            f"{summary['p50']:>9.3f}{summary['p90']:>9.3f}{summary['p99']:>9.3f}"
+        )
+    print(
+        f"CPU: {results['cpu_seconds']}s ({results['cpu_percent']}%), "
+        f"peak memory: {results['max_rss_mb']} MB"
+    )
+    if json_path:
+        with open(json_path, "w") as file:
+            json.dump(results, file, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
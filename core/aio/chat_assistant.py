@@ -0,0 +1,112 @@
+import asyncio
+from typing import List
+
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletionMessageToolCall
+
+from core.chat_assistant import ChatAssistant, StreamedCompletion
+from core.http_client import http_client
+from core.logger import log
+from core.sentence_segmenter import SentenceSegmenter
+from core.tracing import tracer
+
+
+class AsyncChatAssistant(ChatAssistant):
+    """
+    asyncio implementation of `ChatAssistant`.
+
+    History, prompts, tool definitions, stream parsing and the recording of
+    tool results are shared with the synchronous class, whose blocking
+    methods keep working. Tools run in
+    worker threads, so a cancelled turn stops waiting for them right away.
+    """
+
+    def __init__(self, speculative_tools=False, tools=None):
+        super().__init__(speculative_tools, tools)
+        self.async_client = AsyncOpenAI(http_client=http_client.async_client())
+
+    def warm_up(self):
+        """Open a connection of the async client ahead of the first request."""
+        http_client.warm_up_async(str(self.async_client.base_url))
+
+    async def process_text(self, text):
+        """Process text with OpenAI's chat model, maintaining conversation history."""
+        sentences = [sentence async for sentence in self.stream_text(text)]
+        return " ".join(sentences)
+
+    async def stream_text(self, text):
+        """
+        Process text with OpenAI's chat model and stream the response.
+
+        Yields:
+            str: Complete sentences of the response as soon as they are available.
+        """
+        self.start_turn(text)
+        segmenter = SentenceSegmenter()
+        for round in range(self.MAX_TOOL_ROUNDS + 1):
+            with tracer.span("llm") as span:
+                completion = StreamedCompletion(segmenter, span)
+                stream = await self.async_client.chat.completions.create(
+                    **self._completion_options(round), stream=True
+                )
+                async for sentence in self._stream_sentences_async(stream, completion):
+                    yield sentence
+            tool_calls = completion.tool_calls
+            if not tool_calls:
+                break
+
+            results = await self.execute_tool_calls_async(tool_calls)
+            messages = self.record_tool_round(completion.content, tool_calls, results)
+            if messages is not None:
+                with tracer.span("llm") as span:
+                    completion = StreamedCompletion(segmenter, span)
+                    stream = await self.async_client.chat.completions.create(
+                        model="gpt-4o-mini", messages=messages, stream=True
+                    )
+                    async for sentence in self._stream_sentences_async(
+                        stream, completion
+                    ):
+                        yield sentence
+                break
+
+        self.finish_response(completion.content)
+
+    @staticmethod
+    async def _stream_sentences_async(stream, completion):
+        """Yield complete sentences from an async completion stream."""
+        async with stream:
+            async for chunk in stream:
+                for sentence in completion.feed(chunk):
+                    yield sentence
+        for sentence in completion.flush():
+            yield sentence
+
+    async def execute_tool_calls_async(
+        self, tool_calls: List[ChatCompletionMessageToolCall]
+    ):
+        """
+        Execute all tool calls concurrently.
+
+        Returns:
+            list: The result of every tool call, in order.
+        """
+        available_functions = self.tools.available_tools()
+        log.info(f"Found {len(tool_calls)} tool calls.")
+        return await asyncio.gather(
+            *(
+                self._call_tool_async(available_functions, tool_call)
+                for tool_call in tool_calls
+            )
+        )
+
+    async def _call_tool_async(self, available_functions, tool_call):
+        function_name = tool_call.function.name
+        try:
+            return await asyncio.wait_for(
+                asyncio.to_thread(
+                    self._call_tool, available_functions.get(function_name), tool_call
+                ),
+                self._tool_timeout(function_name),
+            )
+        except asyncio.TimeoutError:
+            return self._tool_timed_out(function_name)
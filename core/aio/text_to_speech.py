@@ -0,0 +1,51 @@
+from core.http_client import http_client
+from core.text_to_speech import TextToSpeech
+from core.tracing import tracer
+from core.tts_router import TTSOpenAIBackend
+
+
+class AsyncTTSOpenAIBackend(TTSOpenAIBackend):
+    """TTS OpenAI backend that requests audio with the async HTTP client."""
+
+    def warm_up(self):
+        http_client.warm_up_async(self.tts.TTSOPENAI_URL)
+
+    async def synthesize_async(self, text, index=0):
+        tts = self.tts
+        key, audio_data = tts._ttsopenai_cached(text, index)
+        if audio_data is not None:
+            return audio_data
+
+        response = await http_client.async_client().post(
+            tts.TTSOPENAI_URL,
+            headers=tts.TTSOPENAI_HEADERS,
+            json=tts._ttsopenai_payload(text, index),
+        )
+        return tts._ttsopenai_result(key, index, response)
+
+
+class AsyncTextToSpeech(TextToSpeech):
+    """
+    asyncio implementation of `TextToSpeech`.
+
+    TTS OpenAI requests use the async HTTP client, the other backends run in
+    worker threads.
+    """
+
+    backend_classes = {
+        **TextToSpeech.backend_classes,
+        "ttsopenai": AsyncTTSOpenAIBackend,
+    }
+
+    async def synthesize_async(self, text, index=0):
+        """
+        Synthesize text with the first healthy backend that succeeds.
+
+        Returns:
+            bytes | None: The encoded audio, or None if every backend failed.
+        """
+        with tracer.span("tts"):
+            audio_data = await self.router.synthesize_async(text, index)
+        if index == 0:
+            tracer.mark("tts_first_audio")
+        return audio_data
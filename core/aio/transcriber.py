@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+from groq import AsyncGroq
+
+from core.audio.stt_backends import GroqSTTBackend
+from core.audio.transcriber import Transcriber
+from core.http_client import http_client
+from core.logger import log
+from core.tracing import tracer
+
+
+class AsyncGroqSTTBackend(GroqSTTBackend):
+    """Groq backend that also transcribes with the async Groq client."""
+
+    def __init__(self):
+        super().__init__()
+        self.async_client = AsyncGroq(http_client=http_client.async_client())
+
+    def warm_up(self):
+        """Open a connection of the async client ahead of the first request."""
+        http_client.warm_up_async(str(self.async_client.base_url))
+
+    async def transcribe_async(self, filename, data):
+        transcription = await self.async_client.audio.transcriptions.create(
+            file=(filename, data),
+            model="whisper-large-v3",
+            prompt="Specify context or spelling",
+            response_format="json",
+        )
+        return transcription.text
+
+
+class AsyncTranscriber(Transcriber):
+    """
+    asyncio implementation of `Transcriber`.
+
+    Groq requests use the async client, local models run in worker threads.
+    """
+
+    backend_classes = {**Transcriber.backend_classes, "groq": AsyncGroqSTTBackend}
+
+    async def transcribe_async(self, audio):
+        """
+        Transcribe audio using OpenAI's Whisper model.
+
+        Parameters:
+            audio (io.BytesIO | str): An in-memory WAV file or a path to one.
+        """
+        filename, data = self.read_recording(audio)
+        log.debug("Transcribing %s", filename)
+        with tracer.span("stt"):
+            text = await self._transcribe_with_fallback_async(filename, data)
+        self.remove_recording(audio)
+        return text
+
+    async def _transcribe_with_fallback_async(self, filename, data):
+        error = None
+        backends = self.candidates(data)
+        upload = await asyncio.to_thread(self.encode_upload, filename, data, backends)
+        for backend in backends:
+            start_time = time.monotonic()
+            try:
+                text = await backend.transcribe_async(
+                    *self._backend_input(backend, filename, data, upload)
+                )
+            except Exception as e:
+                error = self._record_failure(backend, start_time, e)
+                continue
+            return self._record_success(backend, start_time, text)
+        raise error
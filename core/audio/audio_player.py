@@ -1,13 +1,57 @@
+import io
+import threading
+
 from pydub import AudioSegment
 from pydub.playback import _play_with_simpleaudio
 
 from core.logger import log
 
 
+class Playback:
+    """Handle for a running playback that signals when it has finished."""
+
+    def __init__(self, play_obj, on_done=None):
+        self.play_obj = play_obj
+        self.on_done = on_done
+        self.done = threading.Event()
+        threading.Thread(target=self._watch, daemon=True).start()
+
+    def _watch(self):
+        self.play_obj.wait_done()
+        self.done.set()
+        if self.on_done:
+            self.on_done()
+
+    def is_playing(self):
+        return not self.done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until playback has finished. Returns False on timeout."""
+        return self.done.wait(timeout)
+
+    def wait_done(self):
+        self.done.wait()
+
+    def stop(self):
+        """Stop playback immediately."""
+        self.play_obj.stop()
+
+
 class AudioPlayer:
     @staticmethod
-    def play_audio(file_path):
+    def play_audio(file_path, on_done=None):
         """Play audio file using pydub."""
         audio = AudioSegment.from_file(file_path)
-        log.debug(f"Playing audio file: {file_path}")
-        return _play_with_simpleaudio(audio)
+        log.debug("Playing audio file: %s", file_path)
+        return Playback(_play_with_simpleaudio(audio), on_done=on_done)
+
+    @staticmethod
+    def decode(audio_data, format="mp3"):
+        """Decode encoded audio in memory to PCM, without a temporary file."""
+        return AudioSegment.from_file(io.BytesIO(audio_data), format=format)
+
+    @staticmethod
+    def play_segment(audio, on_done=None):
+        """Send decoded PCM straight to the audio device."""
+        log.debug("Playing %d ms of audio", len(audio))
+        return Playback(_play_with_simpleaudio(audio), on_done=on_done)
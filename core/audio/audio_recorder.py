@@ -1,110 +1,285 @@
+import functools
+import io
 import os
-import time
+import threading
 import wave
 
 import numpy as np
 import pyaudio
 import simpleaudio as sa
-from pydub.generators import Sine
 
+from core.audio.ring_buffer import RingBuffer
+from core.audio.vad import EnergyVAD
 from core.logger import log
 
+BEEP_SAMPLE_RATE = 44100
+# The gain is applied as a fixed-point factor with this many fractional bits
+GAIN_SHIFT = 8
+
+
+@functools.lru_cache(maxsize=16)
+def beep_buffer(duration_ms, frequency):
+    """Return the raw 16-bit mono samples of a sine beep."""
+    t = np.arange(BEEP_SAMPLE_RATE * duration_ms // 1000) / BEEP_SAMPLE_RATE
+    return (np.sin(2 * np.pi * frequency * t) * 32767).astype(np.int16).tobytes()
+
 
 class AudioRecorder:
     def __init__(
         self,
         RATE=16000,
-        CHUNK=4096,
+        CHUNK=1280,
         FORMAT=pyaudio.paInt16,
         CHANNELS=1,
-        SILENCE_THRESHOLD=1700,
-        SILENCE_DURATION=1,
+        SILENCE_DURATION=0.6,
+        NO_SPEECH_TIMEOUT=3,
         GAIN_FACTOR=1.5,
+        PRE_ROLL=0.5,
+        MAX_RECORD_SECONDS=30,
+        BUFFER_SECONDS=10,
+        SEGMENT_PAUSE=0.3,
+        MIN_SEGMENT_SECONDS=1.0,
         output_folder="recordings",
+        save_recordings=False,
+        vad=None,
+        input_stream=None,
     ):
+        """
+        Parameters:
+            input_stream: Object with a PyAudio-style `read(frames,
+                exception_on_overflow)` method to capture from instead of the
+                default microphone, e.g. a recorded file.
+        """
         self.RATE = RATE
         self.CHUNK = CHUNK
         self.GAIN_FACTOR = GAIN_FACTOR
+        self._gain = round(GAIN_FACTOR * (1 << GAIN_SHIFT))
         self.CHANNELS = CHANNELS
         self.FORMAT = FORMAT
-        self.SILENCE_THRESHOLD = SILENCE_THRESHOLD
+        # Hangover: how long the speaker has to be silent to end the recording
         self.SILENCE_DURATION = SILENCE_DURATION
+        self.NO_SPEECH_TIMEOUT = NO_SPEECH_TIMEOUT
+        self.PRE_ROLL = PRE_ROLL
+        self.MAX_RECORD_SECONDS = MAX_RECORD_SECONDS
+        # Pauses that split a recording into segments for incremental
+        # transcription. Shorter than the hangover, so they don't end it.
+        self.SEGMENT_PAUSE = SEGMENT_PAUSE
+        self.MIN_SEGMENT_SECONDS = MIN_SEGMENT_SECONDS
 
-        self.audio = pyaudio.PyAudio()
-        self.mic_stream = self.audio.open(
-            format=self.FORMAT,
-            channels=self.CHANNELS,
-            rate=self.RATE,
-            input=True,
-            frames_per_buffer=self.CHUNK,
-        )
+        if input_stream is None:
+            self.audio = pyaudio.PyAudio()
+            input_stream = self.audio.open(
+                format=self.FORMAT,
+                channels=self.CHANNELS,
+                rate=self.RATE,
+                input=True,
+                frames_per_buffer=self.CHUNK,
+            )
+        self.mic_stream = input_stream
         self.file_index = 0
 
+        # Audio is captured continuously by a background thread into a
+        # preallocated ring buffer. Consumers read from it with their own
+        # cursor, so nothing is lost while they are busy.
+        self.ring = RingBuffer(int(BUFFER_SECONDS * self.RATE))
+        self._reader = self.ring.reader()
+        self._chunk = np.zeros(self.CHUNK, dtype=np.int16)
+        self.vad = vad or EnergyVAD(rate=self.RATE)
+        frames_per_block = max(1, self.CHUNK // self.vad.frame_size)
+        self._block = np.zeros(
+            frames_per_block * self.vad.frame_size, dtype=np.int16
+        )
+        self._recording = np.zeros(
+            int(MAX_RECORD_SECONDS * self.RATE), dtype=np.int16
+        )
+        self._gain_buffer = np.zeros(len(self._block), dtype=np.int32)
+        self._capture_paused = threading.Event()
+        self._capture_stopped = threading.Event()
+        self._capture_thread = threading.Thread(
+            target=self._capture_loop, daemon=True
+        )
+        self._capture_thread.start()
+
+        # Precompute the beeps that are played on every turn
+        for frequency in (250, 300, 800):
+            beep_buffer(100, frequency)
+
         self.output_folder = output_folder
-        if not os.path.exists(output_folder):
+        self.save_recordings = save_recordings
+        if save_recordings and not os.path.exists(output_folder):
             os.makedirs(output_folder)
 
     def play_beep(self, duration_ms=100, frequency=500):
         """Play a beep sound using simpleaudio."""
 
-        beep = Sine(frequency).to_audio_segment(duration=duration_ms)
-        audio_data = beep.raw_data
         playback_obj = sa.play_buffer(
-            audio_data,
-            num_channels=beep.channels,
-            bytes_per_sample=beep.sample_width,
-            sample_rate=beep.frame_rate,
+            beep_buffer(duration_ms, frequency),
+            num_channels=1,
+            bytes_per_sample=2,
+            sample_rate=BEEP_SAMPLE_RATE,
         )
         playback_obj.wait_done()
 
-    def is_silent(self, data):
-        """Determine if the audio data is silent."""
-        return np.max(np.abs(data)) < self.SILENCE_THRESHOLD
+    def amplify_audio(self, samples):
+        """
+        Amplify up to one block of int16 samples in place.
+
+        The gain is applied in fixed point in a preallocated int32 buffer,
+        so no arrays are allocated.
+        """
+        if self._gain == 1 << GAIN_SHIFT:
+            return samples
+        scratch = self._gain_buffer[: len(samples)]
+        scratch[:] = samples
+        scratch *= self._gain
+        scratch >>= GAIN_SHIFT
+        np.clip(scratch, -32768, 32767, out=scratch)
+        samples[:] = scratch
+        return samples
+
+    def _capture_loop(self):
+        """
+        Continuously read the microphone into the ring buffer.
+
+        If reading fails, e.g. because the device was unplugged, the error is
+        raised in the readers of the ring buffer, so they don't wait forever.
+        """
+        try:
+            while not self._capture_stopped.is_set():
+                data = self.mic_stream.read(self.CHUNK, exception_on_overflow=False)
+                if self._capture_paused.is_set():
+                    continue
+                self.ring.write(np.frombuffer(data, dtype=np.int16))
+        except Exception as e:
+            log.error(f"Audio capture failed: {e}")
+            self.ring.fail(e)
+
+    def pause_capture(self):
+        """Discard microphone input, e.g. while the assistant is speaking."""
+        self._capture_paused.set()
+
+    def resume_capture(self):
+        """Resume writing microphone input to the ring buffer."""
+        self._reader.seek(self.ring.written)
+        self._capture_paused.clear()
+
+    def stop_capture(self):
+        """Stop the capture thread and close the microphone stream."""
+        self._capture_stopped.set()
+        self._capture_thread.join()
+        self.mic_stream.close()
 
-    def amplify_audio(self, data):
-        """Amplify the audio data."""
-        audio_data = np.frombuffer(data, dtype=np.int16)
-        amplified_data = np.clip(audio_data * self.GAIN_FACTOR, -32768, 32767)
-        return amplified_data.astype(np.int16)
+    def record_audio(self, on_segment=None):
+        """
+        Record audio from the microphone.
 
-    def record_audio(self):
-        """Record audio from the microphone and save it to a file."""
+        The recording starts `PRE_ROLL` seconds before the current read
+        position, so speech that overlaps the wake word is not clipped.
+
+        Parameters:
+            on_segment (Callable[[io.BytesIO, bool], None] | None): Called with
+                each speech segment as an in-memory WAV file as soon as the
+                speaker pauses for `SEGMENT_PAUSE` seconds, so it can be
+                transcribed while the recording continues. The last call has
+                `final=True`, and None if the rest contains no speech.
+
+        Returns:
+            io.BytesIO: The recording as an in-memory WAV file.
+        """
         log.info("Recording...")
+        reader = self.ring.reader(
+            self._reader.position - int(self.PRE_ROLL * self.RATE)
+        )
         self.play_beep(100, 800)
-        frames = []
-        silence_start = None
-
-        while True:
-            data = self.mic_stream.read(self.CHUNK, exception_on_overflow=False)
-            amplified_data = self.amplify_audio(data)
-            frames.append(amplified_data)
-
-            audio_data = np.frombuffer(data, dtype=np.int16)
-            if self.is_silent(audio_data):
-                if silence_start is None:
-                    silence_start = time.time()
-                elif time.time() - silence_start > self.SILENCE_DURATION:
-                    break
-            else:
-                silence_start = None
+        # The pre-roll and the beep are kept in the recording, but they contain
+        # the wake word and the beep itself, so they don't count as speech.
+        live_start = self.ring.written
+        recorded = 0
+        speech_started = False
+        silent_frames = 0
+        frame_size = self.vad.frame_size
+        hangover_frames = int(self.SILENCE_DURATION * self.RATE / frame_size)
+        timeout_frames = int(self.NO_SPEECH_TIMEOUT * self.RATE / frame_size)
+        block_size = len(self._block)
+
+        segment_start = 0
+        segment_has_speech = False
+        segment_pause_frames = int(self.SEGMENT_PAUSE * self.RATE / frame_size)
+        min_segment = int(self.MIN_SEGMENT_SECONDS * self.RATE)
 
+        while recorded + block_size <= len(self._recording):
+            reader.read_into(self._block)
+            self._recording[recorded : recorded + block_size] = self._block
+            self.amplify_audio(self._recording[recorded : recorded + block_size])
+            recorded += block_size
+
+            skip = max(0, live_start - (reader.position - block_size)) // frame_size
+            for speech in self.vad.is_speech(self._block)[skip:]:
+                if speech:
+                    speech_started = True
+                    segment_has_speech = True
+                    silent_frames = 0
+                else:
+                    silent_frames += 1
+            limit = hangover_frames if speech_started else timeout_frames
+            if silent_frames > limit:
+                break
+
+            if (
+                on_segment
+                and segment_has_speech
+                and silent_frames >= segment_pause_frames
+                and recorded - segment_start >= min_segment
+            ):
+                segment = self._recording[segment_start:recorded]
+                on_segment(self._to_wav(segment), False)
+                segment_start = recorded
+                segment_has_speech = False
+        else:
+            log.warning(
+                f"Recording reached the maximum length of {self.MAX_RECORD_SECONDS}s"
+            )
+
+        self._reader.seek(reader.position)
         log.info("Finished recording")
+        if on_segment:
+            segment = self._recording[segment_start:recorded]
+            on_segment(self._to_wav(segment) if segment_has_speech else None, True)
         self.play_beep(100, 250)
 
-        OUTPUT_FILENAME_TEMPLATE = os.path.join(
-            self.output_folder, f"recorded_audio_{self.file_index}.wav"
-        )
-        output_filename = OUTPUT_FILENAME_TEMPLATE.format(index=self.file_index)
-        with wave.open(output_filename, "wb") as wf:
+        buffer = self._to_wav(self._recording[:recorded])
+        if self.save_recordings:
+            self.save_recording(buffer)
+
+        self.file_index += 1
+        return buffer
+
+    def _to_wav(self, samples):
+        """Wrap amplified samples in an in-memory WAV file."""
+        buffer = io.BytesIO()
+        buffer.name = f"recorded_audio_{self.file_index}.wav"
+        with wave.open(buffer, "wb") as wf:
             wf.setnchannels(self.CHANNELS)
-            wf.setsampwidth(self.audio.get_sample_size(self.FORMAT))
+            wf.setsampwidth(pyaudio.get_sample_size(self.FORMAT))
             wf.setframerate(self.RATE)
-            wf.writeframes(b"".join(frames))
-        log.info(f"Audio saved as {output_filename}")
+            wf.writeframes(samples.tobytes())
+        buffer.seek(0)
+        return buffer
 
-        self.file_index += 1
+    def save_recording(self, buffer):
+        """Write a recording to the output folder for debugging."""
+        output_filename = os.path.join(self.output_folder, buffer.name)
+        with open(output_filename, "wb") as file:
+            file.write(buffer.getbuffer())
+        log.info(f"Audio saved as {output_filename}")
         return output_filename
 
     def read_chunk(self):
-        """Read a chunk of audio data from the microphone."""
-        return self.mic_stream.read(self.CHUNK)
+        """
+        Read the next chunk of audio data from the ring buffer.
+
+        The returned array is reused by the next call.
+        """
+        self._reader.read_into(self._chunk)
+        self.vad.calibrate(self._chunk)
+        return self._chunk
@@ -0,0 +1,102 @@
+import io
+import os
+import time
+import wave
+
+import numpy as np
+
+from core.logger import log
+
+# libsndfile maps the Opus compression level linearly from 256 kbit/s (0.0)
+# down to 6 kbit/s (1.0)
+OPUS_MAX_BITRATE = 256000
+OPUS_MIN_BITRATE = 6000
+
+
+class UploadEncoder:
+    """
+    Compress WAV recordings before they are uploaded for transcription
+    (requires `soundfile`).
+
+    "flac" is lossless and roughly halves the size of speech. "opus" is
+    lossy; at the default 24 kbit/s it is about a tenth of the PCM size
+    and still transcribes well, but takes considerably more CPU time to
+    encode. Encoding runs in-process with libsndfile.
+    """
+
+    CODECS = {
+        "flac": ("FLAC", "PCM_16", ".flac"),
+        "opus": ("OGG", "OPUS", ".ogg"),
+    }
+
+    def __init__(self, codec="opus", bitrate=24000, uplink_kbps=1000):
+        """
+        Parameters:
+            codec (str): "flac" or "opus".
+            bitrate (int): Target bitrate of Opus in bit/s.
+            uplink_kbps (float): Assumed upload bandwidth, used to report the
+                upload time saved by compressing.
+        """
+        if codec not in self.CODECS:
+            raise ValueError(f"Unknown upload codec: {codec}")
+        try:
+            import soundfile
+        except ImportError as e:
+            raise ImportError(
+                "UploadEncoder requires the 'soundfile' package: pip install soundfile"
+            ) from e
+
+        self.soundfile = soundfile
+        self.codec = codec
+        self.format, self.subtype, self.extension = self.CODECS[codec]
+        if codec == "opus":
+            bitrate = min(max(bitrate, OPUS_MIN_BITRATE), OPUS_MAX_BITRATE)
+            self.compression_level = (OPUS_MAX_BITRATE - bitrate) / (
+                OPUS_MAX_BITRATE - OPUS_MIN_BITRATE
+            )
+        else:
+            self.compression_level = None
+        self.uplink_kbps = uplink_kbps
+
+    def encode(self, filename, data):
+        """
+        Encode WAV data.
+
+        Returns:
+            tuple[str, bytes]: The file name with the codec's extension and
+            the encoded data.
+        """
+        start_time = time.perf_counter()
+        with wave.open(io.BytesIO(data), "rb") as wav_file:
+            rate = wav_file.getframerate()
+            channels = wav_file.getnchannels()
+            samples = np.frombuffer(
+                wav_file.readframes(wav_file.getnframes()), dtype=np.int16
+            ).reshape(-1, channels)
+
+        buffer = io.BytesIO()
+        self.soundfile.write(
+            buffer,
+            samples,
+            rate,
+            format=self.format,
+            subtype=self.subtype,
+            compression_level=self.compression_level,
+        )
+        encoded = buffer.getvalue()
+        encode_time = time.perf_counter() - start_time
+
+        saved_seconds = (len(data) - len(encoded)) * 8 / (self.uplink_kbps * 1000)
+        log.info(
+            "Compressed %s with %s: %d -> %d bytes (%.1fx) in %.0f ms, "
+            "saving ~%.0f ms of upload at %d kbit/s",
+            filename,
+            self.codec,
+            len(data),
+            len(encoded),
+            len(data) / max(1, len(encoded)),
+            encode_time * 1000,
+            saved_seconds * 1000,
+            self.uplink_kbps,
+        )
+        return os.path.splitext(filename)[0] + self.extension, encoded
@@ -0,0 +1,104 @@
+import io
+import threading
+import wave
+
+from core.logger import log
+
+
+class IncrementalTranscription:
+    """
+    Transcribe the speech segments of a recording while it is in progress.
+
+    Pass `add_segment` as the `on_segment` callback of
+    `AudioRecorder.record_audio`. Every segment is transcribed as soon as it
+    is complete, so when the recording ends only the last segment still has
+    to be transcribed. The segments are cut at pauses and don't overlap, so
+    their transcripts are joined in order.
+
+    Listeners registered with `on_partial` are called with the transcript of
+    all segments finished so far, in order, whenever it grows.
+
+    If a segment can't be transcribed, the segments are joined and the whole
+    recording is transcribed once instead.
+    """
+
+    def __init__(self, transcriber, executor):
+        self.transcriber = transcriber
+        self.executor = executor
+        self.segments = []
+        self.futures = []
+        self.texts = []
+        self.listeners = []
+        self.closed = threading.Event()
+        self._lock = threading.Lock()
+
+    def on_partial(self, listener):
+        """Register `listener(text)` for partial transcripts."""
+        self.listeners.append(listener)
+
+    def add_segment(self, buffer, final=False):
+        """Queue a WAV segment for transcription. `buffer` may be None."""
+        if buffer is not None:
+            future = self.executor.submit(self.transcriber.transcribe_buffer, buffer)
+            with self._lock:
+                self.segments.append(buffer)
+                self.futures.append(future)
+            future.add_done_callback(self._publish)
+        if final:
+            self.closed.set()
+
+    def _publish(self, _):
+        with self._lock:
+            texts = []
+            for future in self.futures:
+                if not future.done() or future.exception() is not None:
+                    break
+                texts.append(future.result().strip())
+            if len(texts) <= len(self.texts):
+                return
+            self.texts = texts
+            text = self.stitch(texts)
+
+        log.debug("Partial transcription: %s", text)
+        for listener in self.listeners:
+            try:
+                listener(text)
+            except Exception as e:
+                log.error(f"Error in partial transcription listener: {e}")
+
+    @staticmethod
+    def stitch(texts):
+        return " ".join(text for text in texts if text)
+
+    def result(self, timeout=None):
+        """
+        Wait for the recording to end and all segments to be transcribed.
+
+        Returns:
+            str: The transcript of the whole recording.
+        """
+        if not self.closed.wait(timeout):
+            raise TimeoutError("The recording did not finish in time")
+        try:
+            texts = [future.result().strip() for future in self.futures]
+        except Exception as e:
+            log.warning(
+                f"Segment transcription failed ({e}), transcribing the whole recording"
+            )
+            return self.transcriber.transcribe_buffer(join_wav(self.segments))
+        return self.stitch(texts)
+
+
+def join_wav(buffers):
+    """Join in-memory WAV files with the same format into one."""
+    output = io.BytesIO()
+    output.name = getattr(buffers[0], "name", "audio.wav")
+    with wave.open(output, "wb") as joined:
+        for buffer in buffers:
+            buffer.seek(0)
+            with wave.open(buffer, "rb") as part:
+                if buffer is buffers[0]:
+                    joined.setparams(part.getparams())
+                joined.writeframes(part.readframes(part.getnframes()))
+    output.seek(0)
+    return output
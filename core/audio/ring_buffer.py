@@ -0,0 +1,126 @@
+import threading
+
+import numpy as np
+
+from core.logger import log
+
+
+class RingBuffer:
+    """
+    Fixed-size int16 ring buffer with a single writer and any number of readers.
+
+    Samples are addressed by their absolute position since the buffer was
+    created. The writer copies samples in and only then advances `written`,
+    so readers never need a lock to access the data. The condition is only
+    used to wake up readers that wait for new samples.
+
+    If the writer fails, it passes the error to `fail`, and readers raise it
+    instead of waiting for samples that will never arrive.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.int16)
+        self.written = 0
+        self.error = None
+        self._new_data = threading.Condition()
+
+    def write(self, samples):
+        """Append samples, overwriting the oldest ones once the buffer is full."""
+        samples = samples[-self.capacity :]
+        start = self.written % self.capacity
+        end = start + len(samples)
+        if end <= self.capacity:
+            self.data[start:end] = samples
+        else:
+            split = self.capacity - start
+            self.data[start:] = samples[:split]
+            self.data[: end - self.capacity] = samples[split:]
+
+        self.written += len(samples)
+        with self._new_data:
+            self._new_data.notify_all()
+
+    def fail(self, error):
+        """Stop writing and wake up all readers, which then raise `error`."""
+        with self._new_data:
+            self.error = error
+            self._new_data.notify_all()
+
+    def oldest(self):
+        """Return the position of the oldest sample still in the buffer."""
+        return max(0, self.written - self.capacity)
+
+    def wait_for(self, position, timeout=None):
+        """
+        Block until the buffer holds samples up to `position`.
+
+        Raises:
+            Exception: The error passed to `fail`, if the samples will never
+                arrive.
+        """
+        with self._new_data:
+            arrived = self._new_data.wait_for(
+                lambda: self.written >= position or self.error is not None,
+                timeout=timeout,
+            )
+            if self.written < position and self.error is not None:
+                raise self.error
+            return arrived
+
+    def read_into(self, position, out):
+        """
+        Copy samples starting at `position` into the preallocated array `out`.
+
+        Returns:
+            int: The position of the first sample that was copied. It is later
+            than `position` if those samples were already overwritten.
+        """
+        oldest = self.oldest()
+        if position < oldest:
+            log.warning(f"Ring buffer overrun, dropped {oldest - position} samples")
+            position = oldest
+
+        count = len(out)
+        start = position % self.capacity
+        end = start + count
+        if end <= self.capacity:
+            out[:] = self.data[start:end]
+        else:
+            split = self.capacity - start
+            out[:split] = self.data[start:]
+            out[split:] = self.data[: end - self.capacity]
+        return position
+
+    def reader(self, position=None):
+        """Create a reader starting at `position` (default: the newest sample)."""
+        if position is None:
+            position = self.written
+        return RingBufferReader(self, max(position, self.oldest()))
+
+
+class RingBufferReader:
+    """A read cursor into a `RingBuffer`."""
+
+    def __init__(self, ring, position):
+        self.ring = ring
+        self.position = position
+
+    def read_into(self, out, timeout=None):
+        """
+        Fill `out` with the next samples, waiting until they are captured.
+
+        Returns:
+            bool: False if the samples did not arrive before the timeout.
+
+        Raises:
+            Exception: The error of the writer, if it failed.
+        """
+        if not self.ring.wait_for(self.position + len(out), timeout=timeout):
+            return False
+        self.position = self.ring.read_into(self.position, out) + len(out)
+        return True
+
+    def seek(self, position):
+        """Move the cursor to an absolute position."""
+        self.position = max(position, self.ring.oldest())
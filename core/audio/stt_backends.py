@@ -0,0 +1,113 @@
+import asyncio
+import io
+import threading
+
+from core.http_client import http_client
+from core.logger import log
+
+
+class STTBackend:
+    """
+    Interface of a speech-to-text backend.
+
+    `transcribe` takes a file name and the WAV data (bytes or a binary file
+    object) and returns the transcribed text. It raises on failure, so the
+    `Transcriber` can fall back to the next backend.
+    """
+
+    name = None
+    local = False
+
+    def warm_up(self):
+        """Prepare the backend ahead of the first request."""
+
+    def transcribe(self, filename, data):
+        raise NotImplementedError
+
+    async def transcribe_async(self, filename, data):
+        return await asyncio.to_thread(self.transcribe, filename, data)
+
+
+class GroqSTTBackend(STTBackend):
+    """Whisper large-v3 hosted by Groq."""
+
+    name = "groq"
+
+    def __init__(self):
+        from groq import Groq
+
+        self.client = Groq(http_client=http_client.sdk_client())
+
+    def warm_up(self):
+        """Open a connection to the Groq API ahead of the first request."""
+        http_client.warm_up(str(self.client.base_url), sdk=True)
+
+    def transcribe(self, filename, data):
+        transcription = self.client.audio.transcriptions.create(
+            file=(filename, data),
+            model="whisper-large-v3",
+            prompt="Specify context or spelling",
+            response_format="json",
+        )
+        return transcription.text
+
+
+class LocalWhisperBackend(STTBackend):
+    """
+    Whisper running in-process on the CPU (requires `faster-whisper`).
+
+    The int8-quantized model is loaded once in the background when the
+    backend is created and stays in memory. Requests made before loading
+    has finished wait for it.
+    """
+
+    name = "local"
+    local = True
+
+    def __init__(self, model_size="base", cpu_threads=0, compute_type="int8", language=None):
+        try:
+            import faster_whisper  # noqa: F401
+        except ImportError as e:
+            raise ImportError(
+                "LocalWhisperBackend requires the 'faster-whisper' package: "
+                "pip install faster-whisper"
+            ) from e
+
+        self.model_size = model_size
+        self.cpu_threads = cpu_threads
+        self.compute_type = compute_type
+        self.language = language
+        self.model = None
+        self.error = None
+        self._loaded = threading.Event()
+        threading.Thread(target=self._load, daemon=True).start()
+
+    def _load(self):
+        from faster_whisper import WhisperModel
+
+        try:
+            log.info(f"Loading local Whisper model '{self.model_size}'")
+            self.model = WhisperModel(
+                self.model_size,
+                device="cpu",
+                compute_type=self.compute_type,
+                cpu_threads=self.cpu_threads,
+            )
+            log.info("Local Whisper model loaded")
+        except Exception as e:
+            log.error(f"Failed to load local Whisper model: {e}")
+            self.error = e
+        finally:
+            self._loaded.set()
+
+    def transcribe(self, filename, data):
+        self._loaded.wait()
+        if self.model is None:
+            raise RuntimeError(f"Local Whisper model is not available: {self.error}")
+        if isinstance(data, bytes):
+            data = io.BytesIO(data)
+        segments, _ = self.model.transcribe(
+            data, language=self.language, beam_size=1, vad_filter=False
+        )
+        return "".join(segment.text for segment in segments).strip()
+
@@ -1,24 +1,196 @@
+import io
 import os
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
 
-from groq import Groq
-
+from core.audio.encoding import UploadEncoder
+from core.audio.incremental_transcription import IncrementalTranscription
+from core.audio.stt_backends import GroqSTTBackend, LocalWhisperBackend
+from core.backend_stats import BackendStats
 from core.logger import log
+from core.tracing import tracer
 
 
 class Transcriber:
-    def __init__(self):
-        self.speech_to_text_client = Groq()
+    """
+    Transcribe recordings with the first healthy speech-to-text backend.
+
+    Backends are tried in the configured order, and a failing backend falls
+    back to the next one, so the assistant keeps working on-device when the
+    network is down. With `local_max_seconds` set, local backends are
+    preferred for utterances up to that length and remote ones for longer
+    utterances. With `upload_codec` set, recordings are compressed before
+    they are sent to remote backends.
+    """
+
+    backend_classes = {"groq": GroqSTTBackend, "local": LocalWhisperBackend}
+
+    def __init__(
+        self,
+        backends=("groq",),
+        local_options=None,
+        local_max_seconds=None,
+        upload_codec=None,
+        upload_bitrate=24000,
+    ):
+        """
+        Parameters:
+            backends (Iterable[str]): Names of the backends to use, in order of
+                preference ("groq" or "local").
+            local_options (dict | None): Options for `LocalWhisperBackend`,
+                such as `model_size` and `cpu_threads`.
+            local_max_seconds (float | None): Longest utterance that is
+                transcribed locally first. None keeps the configured order.
+            upload_codec (str | None): "flac" or "opus" to compress uploads,
+                None to upload WAV.
+            upload_bitrate (int): Bitrate of Opus uploads in bit/s.
+        """
+        self.local_options = local_options or {}
+        self.local_max_seconds = local_max_seconds
+        self.backends = [self._create_backend(name) for name in backends]
+        if not self.backends:
+            raise ValueError("At least one STT backend is required")
+        self.stats = {backend.name: BackendStats() for backend in self.backends}
+        self.encoder = (
+            UploadEncoder(upload_codec, upload_bitrate) if upload_codec else None
+        )
+        self._segment_pool = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="stt"
+        )
+
+    def _create_backend(self, name):
+        if name == "local":
+            return self.backend_classes[name](**self.local_options)
+        return self.backend_classes[name]()
+
+    def warm_up(self):
+        """Open connections to the remote backends ahead of the first request."""
+        for backend in self.backends:
+            backend.warm_up()
+
+    def transcribe(self, audio):
+        """
+        Transcribe audio using OpenAI's Whisper model.
+
+        Parameters:
+            audio (io.BytesIO | str): An in-memory WAV file or a path to one.
+        """
+        filename, data = self.read_recording(audio)
+        log.debug("Transcribing %s", filename)
+        text = self._transcribe(filename, data)
+        self.remove_recording(audio)
+        return text
+
+    def start_incremental(self):
+        """
+        Start transcribing a recording segment by segment.
+
+        Returns:
+            IncrementalTranscription: Pass its `add_segment` method as the
+            `on_segment` callback of `AudioRecorder.record_audio`.
+        """
+        return IncrementalTranscription(self, self._segment_pool)
+
+    def transcribe_buffer(self, buffer, filename=None):
+        """Transcribe an in-memory WAV file without touching the disk."""
+        name, data = self.read_recording(buffer)
+        filename = filename or name
+        log.debug("Transcribing buffer: %s", filename)
+        return self._transcribe(filename, data)
 
     def transcribe_file(self, filename):
-        """Transcribe audio using OpenAI's Whisper model."""
-        log.debug(f"Transcribing file: {filename}")
-        with open(filename, "rb") as file:
-            transcription = self.speech_to_text_client.audio.transcriptions.create(
-                file=(filename, file.read()),
-                model="whisper-large-v3",
-                prompt="Specify context or spelling",
-                response_format="json",
-            )
-        os.remove(filename)
-        log.info(f"Transcription: {transcription.text}")
-        return transcription.text
+        """Transcribe an audio file and delete it afterwards."""
+        return self.transcribe(filename)
+
+    @staticmethod
+    def read_recording(audio):
+        """
+        Return the file name and WAV data of a recording.
+
+        Parameters:
+            audio (io.BytesIO | str): An in-memory WAV file or a path to one.
+        """
+        if isinstance(audio, (str, os.PathLike)):
+            with open(audio, "rb") as file:
+                return os.fspath(audio), file.read()
+        audio.seek(0)
+        return getattr(audio, "name", "audio.wav"), audio.read()
+
+    @staticmethod
+    def remove_recording(audio):
+        """Delete a transcribed recording file. In-memory recordings are kept."""
+        if isinstance(audio, (str, os.PathLike)):
+            os.remove(audio)
+
+    def candidates(self, data):
+        """Return the healthy backends in the order to try them for `data`."""
+        backends = [
+            backend for backend in self.backends if self.stats[backend.name].is_healthy()
+        ] or list(self.backends)
+        if self.local_max_seconds is not None:
+            prefer_local = wav_duration(data) <= self.local_max_seconds
+            # Stable sort, so the configured order is kept within each group
+            backends.sort(key=lambda backend: backend.local != prefer_local)
+        return backends
+
+    def _transcribe(self, filename, data):
+        with tracer.span("stt"):
+            return self._transcribe_with_fallback(filename, data)
+
+    def encode_upload(self, filename, data, backends):
+        """
+        Compress the recording if it may be sent to a remote backend.
+
+        Returns:
+            tuple[str, bytes]: The file name and data to upload.
+        """
+        if self.encoder is None or all(backend.local for backend in backends):
+            return filename, data
+        with tracer.span("stt.encode"):
+            return self.encoder.encode(filename, data)
+
+    def _transcribe_with_fallback(self, filename, data):
+        error = None
+        backends = self.candidates(data)
+        upload = self.encode_upload(filename, data, backends)
+        for backend in backends:
+            start_time = time.monotonic()
+            try:
+                text = backend.transcribe(
+                    *self._backend_input(backend, filename, data, upload)
+                )
+            except Exception as e:
+                error = self._record_failure(backend, start_time, e)
+                continue
+            return self._record_success(backend, start_time, text)
+        raise error
+
+    @staticmethod
+    def _backend_input(backend, filename, data, upload):
+        """Return the file name and data to send to `backend`."""
+        # Local backends read the WAV directly
+        return (filename, data) if backend.local else upload
+
+    def _record_failure(self, backend, start_time, error):
+        """Record a failed attempt of `backend` and return the error."""
+        log.error(f"STT backend {backend.name} failed: {error}")
+        self.stats[backend.name].record(time.monotonic() - start_time, False)
+        return error
+
+    def _record_success(self, backend, start_time, text):
+        """Record a successful attempt of `backend` and return the text."""
+        latency = time.monotonic() - start_time
+        self.stats[backend.name].record(latency, True)
+        log.debug("Transcribed with %s in %.2fs", backend.name, latency)
+        log.info(f"Transcription: {text}")
+        return text
+
+
+def wav_duration(data):
+    """Return the length of WAV data in seconds, or 0 if it can't be read."""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav_file:
+            return wav_file.getnframes() / wav_file.getframerate()
+    except (wave.Error, EOFError):
+        return 0.0
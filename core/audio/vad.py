@@ -0,0 +1,109 @@
+import numpy as np
+
+
+class EnergyVAD:
+    """
+    Frame-level voice activity detection based on RMS energy.
+
+    The noise floor follows the quietest frames of each block: it drops
+    quickly when the room gets quieter and rises slowly when it gets louder,
+    so a constant background noise is not mistaken for speech.
+    """
+
+    def __init__(
+        self,
+        rate=16000,
+        frame_ms=20,
+        threshold_ratio=3.0,
+        min_energy=300,
+        noise_floor=100,
+        floor_rise=0.005,
+        floor_fall=0.5,
+    ):
+        self.rate = rate
+        self.frame_size = rate * frame_ms // 1000
+        self.threshold_ratio = threshold_ratio
+        self.min_energy = min_energy
+        self.noise_floor = noise_floor
+        self.floor_rise = floor_rise
+        self.floor_fall = floor_fall
+
+    def frame_energy(self, samples):
+        """Return the RMS energy of every complete frame in `samples`."""
+        n_frames = len(samples) // self.frame_size
+        frames = samples[: n_frames * self.frame_size].reshape(n_frames, -1)
+        frames = frames.astype(np.float32)
+        return np.sqrt(np.einsum("ij,ij->i", frames, frames) / self.frame_size)
+
+    def update_noise_floor(self, energy):
+        """Track the background noise level from a block of frame energies."""
+        if not len(energy):
+            return
+        quietest = float(energy.min())
+        if quietest < self.noise_floor:
+            self.noise_floor += self.floor_fall * (quietest - self.noise_floor)
+        else:
+            rise = self.noise_floor * (1 + self.floor_rise * len(energy))
+            self.noise_floor = min(quietest, rise)
+
+    def calibrate(self, samples):
+        """Update the noise floor from audio heard outside of a recording."""
+        self.update_noise_floor(self.frame_energy(samples))
+
+    def is_speech(self, samples):
+        """
+        Classify every frame in `samples`.
+
+        Returns:
+            np.ndarray: One boolean per frame, True where speech was detected.
+        """
+        energy = self.frame_energy(samples)
+        threshold = max(self.min_energy, self.noise_floor * self.threshold_ratio)
+        self.update_noise_floor(energy)
+        return energy > threshold
+
+
+class WebRTCVAD:
+    """Voice activity detection using the WebRTC VAD (requires `webrtcvad`)."""
+
+    def __init__(self, rate=16000, frame_ms=20, aggressiveness=2):
+        try:
+            import webrtcvad
+        except ImportError as e:
+            raise ImportError(
+                "WebRTCVAD requires the 'webrtcvad' package: pip install webrtcvad"
+            ) from e
+
+        if frame_ms not in (10, 20, 30):
+            raise ValueError("WebRTC VAD only supports 10, 20 or 30 ms frames")
+        self.rate = rate
+        self.frame_size = rate * frame_ms // 1000
+        self.vad = webrtcvad.Vad(aggressiveness)
+
+    def calibrate(self, samples):
+        """The WebRTC VAD adapts to background noise internally."""
+
+    def is_speech(self, samples):
+        """
+        Classify every frame in `samples`.
+
+        Returns:
+            np.ndarray: One boolean per frame, True where speech was detected.
+        """
+        data = samples.tobytes()
+        frame_bytes = self.frame_size * 2
+        return np.array(
+            [
+                self.vad.is_speech(data[i : i + frame_bytes], self.rate)
+                for i in range(0, len(data) - frame_bytes + 1, frame_bytes)
+            ],
+            dtype=bool,
+        )
+
+
+def create_vad(backend="energy", **kwargs):
+    """Create a VAD backend by name ("energy" or "webrtc")."""
+    backends = {"energy": EnergyVAD, "webrtc": WebRTCVAD}
+    if backend not in backends:
+        raise ValueError(f"Unknown VAD backend: {backend}")
+    return backends[backend](**kwargs)
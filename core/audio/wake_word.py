@@ -0,0 +1,130 @@
+import os
+import time
+from collections import deque
+
+from core.audio.wakeword_models import ensure_wakeword_model
+from core.logger import log
+
+
+class WakeWordDetector:
+    """
+    Detect one or more wake words in 80 ms frames of 16 kHz audio.
+
+    Only the score of the newest frame is checked. A wake word fires once its
+    score has reached its threshold for `patience` consecutive frames, and no
+    wake word fires again during the `refractory` seconds that follow, so a
+    single utterance can't trigger twice.
+
+    Inference time and CPU time are measured for every frame, so the
+    detector can be sized for weak hardware. openWakeWord runs its ONNX
+    session single-threaded, so the CPU time of the calling thread is the
+    cost of inference, unaffected by the other threads of the process.
+    """
+
+    # openWakeWord's native frame: 80 ms at 16 kHz
+    FRAME_SIZE = 1280
+    RATE = 16000
+
+    def __init__(
+        self,
+        wake_words=None,
+        inference_framework="onnx",
+        patience=1,
+        refractory=1.0,
+        stats_interval=60.0,
+    ):
+        """
+        Parameters:
+            wake_words (dict[str, float] | None): Wake word model names and
+                their thresholds. Defaults to "alexa" at 0.5.
+            stats_interval (float): Seconds of audio between two debug logs
+                of the inference statistics.
+        """
+        from openwakeword.model import Model
+
+        wake_words = wake_words or {"alexa": 0.5}
+        model_paths = [
+            ensure_wakeword_model(name, inference_framework) for name in wake_words
+        ]
+        self.model = Model(
+            wakeword_models=model_paths, inference_framework=inference_framework
+        )
+        # openWakeWord names its scores after the model files
+        self.wake_words = {
+            os.path.splitext(os.path.basename(path))[0]: name
+            for path, name in zip(model_paths, wake_words)
+        }
+        self.thresholds = {
+            key: wake_words[name] for key, name in self.wake_words.items()
+        }
+        self.patience = patience
+        self.refractory_frames = int(refractory * self.RATE / self.FRAME_SIZE)
+        self.stats_frames = int(stats_interval * self.RATE / self.FRAME_SIZE)
+
+        self._hits = dict.fromkeys(self.thresholds, 0)
+        self._refractory = 0
+        self.frames = 0
+        self.inference_times = deque(maxlen=self.stats_frames or 1)
+        self.cpu_time = 0.0
+
+    def process(self, frame, min_threshold=None):
+        """
+        Run the model on one frame of audio.
+
+        Parameters:
+            frame (np.ndarray): `FRAME_SIZE` 16-bit samples.
+            min_threshold (float | None): Raise every threshold to at least
+                this value, e.g. while the assistant is speaking.
+
+        Returns:
+            str | None: The name of the wake word that fired, or None.
+        """
+        start_time = time.perf_counter()
+        start_cpu = time.thread_time()
+        scores = self.model.predict(frame)
+        self.inference_times.append(time.perf_counter() - start_time)
+        self.cpu_time += time.thread_time() - start_cpu
+        self.frames += 1
+        if self.stats_frames and self.frames % self.stats_frames == 0:
+            log.debug("Wake word stats: %s", self.stats())
+
+        if self._refractory:
+            self._refractory -= 1
+            return None
+
+        for key, score in scores.items():
+            threshold = self.thresholds[key]
+            if min_threshold is not None:
+                threshold = max(threshold, min_threshold)
+            self._hits[key] = self._hits[key] + 1 if score >= threshold else 0
+            if self._hits[key] >= self.patience:
+                wake_word = self.wake_words[key]
+                log.info(f"Wake word '{wake_word}' detected ({score:.2f})")
+                self.reset()
+                self._refractory = self.refractory_frames
+                return wake_word
+        return None
+
+    def reset(self):
+        """Clear the model's audio history and the pending hits."""
+        self.model.reset()
+        self._hits = dict.fromkeys(self.thresholds, 0)
+
+    def stats(self):
+        """
+        Return the inference statistics.
+
+        `cpu_load` is the CPU time of the calling thread spent in inference
+        relative to the duration of the processed audio; below 1.0 the
+        detector keeps up.
+        """
+        if not self.frames:
+            return {"frames": 0}
+        times = sorted(self.inference_times)
+        audio_seconds = self.frames * self.FRAME_SIZE / self.RATE
+        return {
+            "frames": self.frames,
+            "mean_ms": round(1000 * sum(times) / len(times), 2),
+            "p99_ms": round(1000 * times[min(len(times) - 1, int(len(times) * 0.99))], 2),
+            "cpu_load": round(self.cpu_time / audio_seconds, 3),
+        }
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from core.http_client import http_client
+from core.logger import log
+
+MANIFEST_FILENAME = "manifest.json"
+# (connect, read) timeouts of model downloads in seconds
+DOWNLOAD_TIMEOUT = (3.05, 60)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _required_models(model_name, inference_framework):
+    """Return (path, download URL) of every file the wake word model needs."""
+    import openwakeword
+
+    extension = f".{inference_framework}"
+    models = list(openwakeword.FEATURE_MODELS.values())
+    models.append(openwakeword.MODELS[model_name])
+    return [
+        (
+            model["model_path"].replace(".tflite", extension),
+            model["download_url"].replace(".tflite", extension),
+        )
+        for model in models
+    ]
+
+
+def _load_manifest(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _is_valid(path, manifest):
+    """
+    Check a model file against the size and hash pinned in the manifest.
+
+    Only files this module downloaded and verified itself are pinned, so a
+    file without a manifest entry is not trusted. Size and modification time
+    are compared first, so the file is only hashed again when it has changed
+    since it was last verified.
+    """
+    name = os.path.basename(path)
+    entry = manifest.get(name)
+    if entry is None or not os.path.exists(path):
+        return False
+
+    stat = os.stat(path)
+    if stat.st_size != entry["size"]:
+        log.warning(f"Wake word model {name} does not match the manifest")
+        return False
+    if entry["mtime"] == stat.st_mtime:
+        return True
+    if _file_sha256(path) == entry["sha256"]:
+        entry["mtime"] = stat.st_mtime
+        return True
+
+    log.warning(f"Wake word model {name} does not match the manifest")
+    return False
+
+
+def _download(url, path):
+    """
+    Download a model file and return its manifest entry.
+
+    The file is written to a temporary file next to `path` and only moved
+    into place when the response was successful, is not an HTML page and
+    has the announced, non-zero size.
+    """
+    name = os.path.basename(path)
+    response = http_client.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT)
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=f"{name}.", suffix=".tmp"
+    )
+    try:
+        with response, os.fdopen(fd, "wb") as file:
+            response.raise_for_status()
+            if response.headers.get("Content-Type", "").startswith("text/html"):
+                raise ValueError(f"Download of {name} returned an HTML page")
+            for chunk in response.iter_content(chunk_size=1 << 16):
+                file.write(chunk)
+
+        size = os.path.getsize(temp_path)
+        expected = int(response.headers.get("Content-Length", size))
+        if size == 0 or size != expected:
+            raise ValueError(
+                f"Download of {name} is incomplete: {size} of {expected} bytes"
+            )
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return {
+        "size": size,
+        "mtime": os.stat(path).st_mtime,
+        "sha256": _file_sha256(path),
+    }
+
+
+def ensure_wakeword_model(model_name, inference_framework="onnx"):
+    """
+    Make sure the wake word model and its feature models are available.
+
+    Only files that are missing or fail verification against the size and
+    hash pinned in the local manifest are downloaded. Custom model paths are used as they are.
+
+    Returns:
+        str: The path or name to pass to `openwakeword.model.Model`.
+    """
+    if os.path.exists(model_name):
+        return model_name
+
+    required = _required_models(model_name, inference_framework)
+    models_dir = os.path.dirname(required[0][0])
+    os.makedirs(models_dir, exist_ok=True)
+    manifest_path = os.path.join(models_dir, MANIFEST_FILENAME)
+    manifest = _load_manifest(manifest_path)
+
+    for path, url in required:
+        if _is_valid(path, manifest):
+            continue
+        name = os.path.basename(path)
+        log.info(f"Downloading wake word model {name}")
+        manifest.pop(name, None)
+        manifest[name] = _download(url, path)
+
+    with open(manifest_path, "w") as file:
+        json.dump(manifest, file, indent=2)
+    return model_name
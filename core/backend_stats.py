@@ -0,0 +1,58 @@
+import threading
+import time
+from collections import deque
+
+
+class BackendStats:
+    """
+    Latencies and outcomes of the most recent requests to a backend.
+
+    A backend whose error rate exceeds `max_error_rate` is marked unhealthy
+    for `cooldown` seconds. After that it gets traffic again, and the next
+    failure takes it out right away while the error rate is still high.
+    """
+
+    def __init__(self, window=100, max_error_rate=0.5, min_requests=4, cooldown=30.0):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.max_error_rate = max_error_rate
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.unhealthy_until = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency, success):
+        with self._lock:
+            self.outcomes.append(success)
+            if success:
+                self.latencies.append(latency)
+            elif (
+                len(self.outcomes) >= self.min_requests
+                and self.error_rate() > self.max_error_rate
+            ):
+                self.unhealthy_until = time.monotonic() + self.cooldown
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def percentile(self, percent):
+        """Return the latency percentile of successful requests, or None."""
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))]
+
+    def is_healthy(self):
+        return time.monotonic() >= self.unhealthy_until
+
+    def summary(self):
+        return {
+            "requests": len(self.outcomes),
+            "error_rate": round(self.error_rate(), 3),
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "healthy": self.is_healthy(),
+        }
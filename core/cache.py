@@ -0,0 +1,146 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from core.logger import log
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on the file `path`, also across processes."""
+    with open(path, "a+b") as file:
+        if fcntl:
+            fcntl.flock(file, fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(file, fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after `ttl` seconds.
+
+    If `path` is given, the cache is loaded from and saved to a JSON file, so
+    keys must be strings and values JSON serializable. Several processes can
+    share the file; entries saved by the others are merged in on every save.
+    """
+
+    def __init__(self, maxsize=128, ttl=3600, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self.entries[key] = (time.time() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            if self.path:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            if self.path:
+                self._save(merge=False)
+
+    def stats(self):
+        """Return hit, miss and eviction counters."""
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _read(self):
+        """Return the unexpired entries stored in the file."""
+        try:
+            with open(self.path) as file:
+                entries = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log.warning(f"Could not load cache {self.path}: {e}")
+            return {}
+
+        now = time.time()
+        return {
+            key: (expires_at, value)
+            for key, (expires_at, value) in entries.items()
+            if expires_at >= now
+        }
+
+    def _load(self):
+        self.entries.update(self._read())
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def _save(self, merge=True):
+        """
+        Write the entries to the file.
+
+        With `merge`, entries that other processes saved in the meantime are
+        kept as the least recently used ones. The file is locked while it is
+        read and replaced, and every writer uses its own temporary file.
+        """
+        folder = os.path.dirname(self.path) or "."
+        os.makedirs(folder, exist_ok=True)
+        with file_lock(f"{self.path}.lock"):
+            if merge:
+                for key, entry in self._read().items():
+                    if key not in self.entries:
+                        self.entries[key] = entry
+                        self.entries.move_to_end(key, last=False)
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+
+            fd, temp_path = tempfile.mkstemp(
+                dir=folder, prefix=f"{os.path.basename(self.path)}.", suffix=".tmp"
+            )
+            try:
+                with os.fdopen(fd, "w") as file:
+                    json.dump(self.entries, file)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
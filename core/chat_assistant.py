@@ -1,29 +1,116 @@
 import datetime
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from typing import List
 
 from openai import OpenAI
 from openai.types.chat import ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
 
+from core.conversation_history import ConversationHistory
+from core.http_client import http_client
 from core.logger import log
+from core.result_compaction import ResultCompactor
+from core.sentence_segmenter import SentenceSegmenter
+from core.speculation import ToolSpeculator
 from core.tools import Tools
+from core.tracing import tracer
+
+
+class StreamedCompletion:
+    """
+    Collect the text and tool calls of a streamed completion.
+
+    `feed` takes the chunks as they arrive and returns the sentences that
+    are complete, so the sync and the asyncio implementation parse streams
+    the same way. The arrival of the first chunk is marked on `span`.
+    """
+
+    def __init__(self, segmenter, span):
+        self.segmenter = segmenter
+        self.span = span
+        self.content = ""
+        self._tool_calls = {}
+
+    @property
+    def tool_calls(self):
+        """The requested tool calls, in order."""
+        return [self._tool_calls[index] for index in sorted(self._tool_calls)]
+
+    def feed(self, chunk):
+        """Add a chunk and return the sentences that are complete."""
+        if not chunk.choices:
+            return []
+        self.span.mark("first_token")
+        delta = chunk.choices[0].delta
+        if delta.tool_calls:
+            self._accumulate_tool_call_deltas(delta.tool_calls)
+        if not delta.content:
+            return []
+        self.content += delta.content
+        return self.segmenter.feed(delta.content)
+
+    def flush(self):
+        """Return the rest of the text once the stream has ended."""
+        return self.segmenter.flush()
+
+    def _accumulate_tool_call_deltas(self, deltas):
+        """Merge streamed tool call fragments into complete tool calls by index."""
+        for delta in deltas:
+            tool_call = self._tool_calls.get(delta.index)
+            if tool_call is None:
+                tool_call = ChatCompletionMessageToolCall(
+                    id="",
+                    type="function",
+                    function=Function(name="", arguments=""),
+                )
+                self._tool_calls[delta.index] = tool_call
+            if delta.id:
+                tool_call.id = delta.id
+            if delta.function:
+                if delta.function.name:
+                    tool_call.function.name += delta.function.name
+                if delta.function.arguments:
+                    tool_call.function.arguments += delta.function.arguments
 
 
 class ChatAssistant:
-    def __init__(self):
-        self.client = OpenAI()
-        self.tools = Tools(
+    # How often the model may call tools before it has to answer
+    MAX_TOOL_ROUNDS = 3
+    DEFAULT_TOOL_TIMEOUT = 8
+    TOOL_TIMEOUTS = {"websearch": 10}
+
+    def __init__(self, speculative_tools=False, tools=None):
+        """
+        With `speculative_tools`, likely tool calls are started from the
+        transcript before the model requests them (see `ToolSpeculator`).
+
+        `tools` can be shared by several assistants, e.g. by the sessions of
+        a server, so they share the tool caches. Clearing the history is
+        handled by every assistant itself.
+        """
+        self.client = OpenAI(http_client=http_client.sdk_client())
+        self.tools = tools or Tools(
             additional_tools={
                 "clear_conversation_history": self.clear_conversation_history,
             }
         )
-        self.conversation_history = []
+        self.history = ConversationHistory(summarizer=self.summarize_history)
+        self.compactor = ResultCompactor()
+        self._tool_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tool")
+        self.speculator = (
+            ToolSpeculator(self.tools, self._tool_pool) if speculative_tools else None
+        )
+
+    def warm_up(self):
+        """Open a connection to the OpenAI API ahead of the first request."""
+        http_client.warm_up(str(self.client.base_url), sdk=True)
 
     def get_system_prompt(self):
-        current_date = datetime.datetime.now()
-        current_date = current_date.strftime("%Y-%m-%d %H:%M:%S")
-        return (
-            """You are Bix, a member of the Schuppen who embodies human emotions and feelings. You have two distinct personalities: helpful and rude.
+        # The system prompt must not change between calls, so the provider can
+        # reuse the cached prompt prefix. The time is sent in `start_turn`.
+        return """You are Bix, a member of the Schuppen who embodies human emotions and feelings. You have two distinct personalities: helpful and rude.
 
 1. **Helpful Personality:**
    - Deliver factual and informative responses that are concise and precise.
@@ -40,92 +127,250 @@ class ChatAssistant:
 - YOU NEVER BREAK CHARACTER AND ALWAYS STAY IN YOUR ROLE.
 - You will NEVER include links or markdown text in your responses. All answers must be optimized for verbal delivery via a text-to-speech engine, ensuring clarity and engagement.
 """
-            + f"\nCurrent date and time: {current_date}"
+
+    def start_turn(self, text):
+        """Start a new turn in the history with the current time and user text."""
+        current_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+        self.history.start_turn()
+        self.history.append(
+            {"role": "system", "content": f"Current date and time: {current_date}"}
         )
+        self.history.append({"role": "user", "content": text})
+        if self.speculator is not None:
+            self.speculator.observe(text)
 
-    def process_text_with_openai(self, text):
-        """Process text with OpenAI's chat model, maintaining conversation history."""
-        self.conversation_history.append({"role": "user", "content": text})
+    def summarize_history(self, summary, messages):
+        """Fold old messages into the running conversation summary."""
+        transcript = "\n".join(
+            f"{message['role']}: {message['content']}"
+            for message in messages
+            if message["role"] in ("user", "assistant") and message.get("content")
+        )
         response = self.client.chat.completions.create(
             model="gpt-4o-mini",
-            messages=[{"role": "system", "content": self.get_system_prompt()}]
-            + self.conversation_history,
-            tools=self.tools.get_tools_json(),
-            temperature=0.7,
-            tool_choice="auto",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "Update the summary of a conversation with the new "
+                    "messages. Keep names, facts, preferences and open questions. "
+                    "Answer with the summary only, at most 150 words.",
+                },
+                {
+                    "role": "user",
+                    "content": f"Summary:\n{summary}\n\nNew messages:\n{transcript}",
+                },
+            ],
+            temperature=0,
         )
+        return response.choices[0].message.content
 
-        response_message = response.choices[0].message
-        tool_calls: List[ChatCompletionMessageToolCall] | None = (
-            response_message.tool_calls
-        )
+    def process_text_with_openai(self, text):
+        """Process text with OpenAI's chat model, maintaining conversation history."""
+        self.start_turn(text)
+        for round in range(self.MAX_TOOL_ROUNDS + 1):
+            with tracer.span("llm"):
+                response = self.client.chat.completions.create(
+                    **self._completion_options(round)
+                )
+            response_message = response.choices[0].message
+            tool_calls: List[ChatCompletionMessageToolCall] | None = (
+                response_message.tool_calls
+            )
+            if not tool_calls:
+                break
+
+            results = self.execute_tool_calls(tool_calls)
+            messages = self.record_tool_round(
+                response_message.content, tool_calls, results
+            )
+            if messages is not None:
+                return self.answer_after_clear(messages)
+
+        self.finish_response(response_message.content)
+        return response_message.content
 
-        if tool_calls:
-            # Append the tool response to the conversation history
-            self.conversation_history.append(response_message)
-            return self.handle_function_calls(tool_calls, response_message)
-        else:
-            self.conversation_history.append(
-                {"role": "assistant", "content": response_message.content}
+    def stream_text_with_openai(self, text, cancelled=None):
+        """
+        Process text with OpenAI's chat model and stream the response.
+
+        Parameters:
+            cancelled (threading.Event | None): Once set, no more tools are
+                run and nothing more is added to the history.
+
+        Yields:
+            str: Complete sentences of the response as soon as they are available.
+        """
+        self.start_turn(text)
+        segmenter = SentenceSegmenter()
+        for round in range(self.MAX_TOOL_ROUNDS + 1):
+            with tracer.span("llm") as span:
+                completion = StreamedCompletion(segmenter, span)
+                stream = self.client.chat.completions.create(
+                    **self._completion_options(round), stream=True
+                )
+                yield from self._stream_sentences(stream, completion)
+            if cancelled is not None and cancelled.is_set():
+                log.info("Response cancelled")
+                return
+            tool_calls = completion.tool_calls
+            if not tool_calls:
+                break
+
+            results = self.execute_tool_calls(tool_calls)
+            messages = self.record_tool_round(completion.content, tool_calls, results)
+            if cancelled is not None and cancelled.is_set():
+                log.info("Response cancelled")
+                return
+            if messages is not None:
+                with tracer.span("llm") as span:
+                    completion = StreamedCompletion(segmenter, span)
+                    stream = self.client.chat.completions.create(
+                        model="gpt-4o-mini", messages=messages, stream=True
+                    )
+                    yield from self._stream_sentences(stream, completion)
+                break
+
+        self.finish_response(completion.content)
+
+    def _completion_options(self, round):
+        """Options for a completion; the last round may not call tools anymore."""
+        return {
+            "model": "gpt-4o-mini",
+            "messages": self.history.build_messages(self.get_system_prompt()),
+            "tools": self.tools.get_tools_json(),
+            "temperature": 0.7,
+            "tool_choice": "auto" if round < self.MAX_TOOL_ROUNDS else "none",
+        }
+
+    @staticmethod
+    def _stream_sentences(stream, completion):
+        """Yield complete sentences from a completion stream."""
+        for chunk in stream:
+            yield from completion.feed(chunk)
+        yield from completion.flush()
+
+    def answer_after_clear(self, messages):
+        """Answer after the history was cleared, using the messages from before."""
+        with tracer.span("llm"):
+            second_response = self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
             )
-            log.info("Response: %s", response_message.content)
-            return response_message.content
+        content = second_response.choices[0].message.content
+        self.finish_response(content)
+        return content
+
+    def execute_tool_calls(self, tool_calls: List[ChatCompletionMessageToolCall]):
+        """
+        Execute all tool calls concurrently.
 
-    def handle_function_calls(
-        self, tool_calls: List[ChatCompletionMessageToolCall], response_message
-    ):
-        """Handle tool calls from OpenAI response."""
+        Returns:
+            list: The result of every tool call, in order.
+        """
         available_functions = self.tools.available_tools()
         log.info(f"Found {len(tool_calls)} tool calls.")
 
-        for tool_call in tool_calls:
+        futures = [
+            self._tool_pool.submit(
+                self._call_tool,
+                available_functions.get(tool_call.function.name),
+                tool_call,
+            )
+            for tool_call in tool_calls
+        ]
+        deadline = time.monotonic()
+        results = []
+        for tool_call, future in zip(tool_calls, futures):
             function_name = tool_call.function.name
-            function_to_call = available_functions.get(function_name)
-            function_parameters = json.loads(tool_call.function.arguments)
-            if function_to_call is None:
-                log.warning(f"Function '{function_name}' not found.")
-                return "Function not found."
-
-            if function_name == "clear_conversation_history":
-                log.info(f"Conversation history cleared.")
-                old_history = self.conversation_history.copy()
-                function_to_call()
-                old_history.append(
-                    {
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "name": function_name,
-                        "content": "Function executed.",
-                    }
+            timeout = self._tool_timeout(function_name)
+            try:
+                results.append(
+                    future.result(
+                        timeout=max(0.0, deadline + timeout - time.monotonic())
+                    )
                 )
-                second_response = self.client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "system", "content": self.get_system_prompt()}]
-                    + old_history,
-                )
-                return second_response.choices[0].message.content
-            else:
-                log.info(
-                    f"Executing function '{function_name}' with parameters: {function_parameters}"
+            except TimeoutError:
+                results.append(self._tool_timed_out(function_name))
+        return results
+
+    def _tool_timeout(self, function_name):
+        return self.TOOL_TIMEOUTS.get(function_name, self.DEFAULT_TOOL_TIMEOUT)
+
+    @staticmethod
+    def _tool_timed_out(function_name):
+        """Log a tool call that timed out and return its result."""
+        log.warning(f"Function '{function_name}' timed out.")
+        return {"error": "The function timed out."}
+
+    def record_tool_round(self, content, tool_calls, results):
+        """
+        Add the assistant message with the tool calls and their results, in
+        order, to the history.
+
+        Returns:
+            list | None: If the conversation history was cleared, the messages
+            from before clearing to answer with, otherwise None.
+        """
+        self.history.append(
+            {
+                "role": "assistant",
+                "content": content or None,
+                "tool_calls": [tool_call.model_dump() for tool_call in tool_calls],
+            }
+        )
+        for tool_call, result in zip(tool_calls, results):
+            self.history.append(
+                {
+                    "role": "tool",
+                    "tool_call_id": tool_call.id,
+                    "name": tool_call.function.name,
+                    "content": json.dumps(result, ensure_ascii=False),
+                }
+            )
+
+        if not any(
+            tool_call.function.name == "clear_conversation_history"
+            for tool_call in tool_calls
+        ):
+            return None
+        old_history = self.history.build_messages(self.get_system_prompt())
+        self.clear_conversation_history()
+        return old_history
+
+    def finish_response(self, content):
+        """Add the final answer of a turn to the history."""
+        self.history.append({"role": "assistant", "content": content})
+        log.info("Response: %s", content)
+
+    def _call_tool(self, function_to_call, tool_call):
+        """Run a single tool call and return its compacted result."""
+        function_name = tool_call.function.name
+        if function_name == "clear_conversation_history":
+            # Cleared in `record_tool_round`, once all results are recorded
+            return "Function executed."
+        if function_to_call is None:
+            log.warning(f"Function '{function_name}' not found.")
+            return "Function not found."
+
+        try:
+            function_parameters = json.loads(tool_call.function.arguments or "{}")
+            if self.speculator is not None:
+                function_to_call = (
+                    self.speculator.claim(function_name, function_parameters)
+                    or function_to_call
                 )
+            log.info(
+                f"Executing function '{function_name}' with parameters: {function_parameters}"
+            )
+            with tracer.span(f"tool.{function_name}"):
                 result = function_to_call(function_parameters)
-                self.conversation_history.append(
-                    {
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "name": function_name,
-                        "content": json.dumps(result),
-                    }
-                )
-                second_response = self.client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "system", "content": self.get_system_prompt()}]
-                    + self.conversation_history,
-                )
-                return second_response.choices[0].message.content
+        except Exception as e:
+            log.error(f"Error executing function '{function_name}': {e}")
+            return {"error": str(e)}
+        return self.compactor.compact(function_name, function_parameters, result)
 
     def clear_conversation_history(self):
         """Clear the conversation history."""
-        self.conversation_history.clear()
+        self.history.clear()
         log.info("Conversation history cleared.")
         return True
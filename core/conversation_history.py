@@ -0,0 +1,132 @@
+import json
+import threading
+
+from core.logger import log
+from core.tokens import estimate_tokens
+
+# Approximate per-message overhead of the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def message_tokens(message):
+    """Estimate the number of tokens a message takes up in the prompt."""
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message.get("content") or "")
+    if message.get("tool_calls"):
+        tool_calls = json.dumps(message["tool_calls"], ensure_ascii=False)
+        tokens += estimate_tokens(tool_calls)
+    return tokens
+
+
+def extractive_summary(summary, messages, max_chars=1200):
+    """Summarize turns without a model by keeping the start of every message."""
+    lines = [summary] if summary else []
+    for message in messages:
+        if message["role"] in ("user", "assistant") and message.get("content"):
+            lines.append(f"{message['role']}: {message['content'][:200]}")
+    return "\n".join(lines)[-max_chars:]
+
+
+class ConversationHistory:
+    """
+    Conversation history that stays within a token budget.
+
+    Messages are grouped into turns, one per user request, and the tokens of
+    every message are counted once when it is added. When
+    the history exceeds `token_budget`, the oldest turns are removed and
+    folded into a running summary in the background. The summary is sent
+    right after the system prompt, so the prompt prefix only changes when
+    turns are compacted and provider-side prompt caching keeps working.
+    """
+
+    def __init__(
+        self, token_budget=3000, summarizer=None, keep_tool_messages=False
+    ):
+        self.token_budget = token_budget
+        self.summarizer = summarizer or extractive_summary
+        self.keep_tool_messages = keep_tool_messages
+        self.turns = []
+        self.turn_tokens = []
+        self.summary = ""
+        self._lock = threading.Lock()
+        self._summary_lock = threading.Lock()
+
+    def start_turn(self):
+        """Begin a new turn. Earlier turns are collapsed and compacted."""
+        with self._lock:
+            if self.turns and not self.keep_tool_messages:
+                self.turns[-1] = self._collapse(self.turns[-1])
+                self.turn_tokens[-1] = sum(map(message_tokens, self.turns[-1]))
+            self.turns.append([])
+            self.turn_tokens.append(0)
+            dropped = self._enforce_budget()
+        if dropped:
+            threading.Thread(
+                target=self._summarize, args=(dropped,), daemon=True
+            ).start()
+
+    def append(self, message):
+        """Add a message (dict or OpenAI message object) to the current turn."""
+        if hasattr(message, "model_dump"):
+            message = message.model_dump(exclude_none=True)
+        tokens = message_tokens(message)
+        with self._lock:
+            if not self.turns:
+                self.turns.append([])
+                self.turn_tokens.append(0)
+            self.turns[-1].append(message)
+            self.turn_tokens[-1] += tokens
+
+    def messages(self):
+        """Return a copy of all messages in the history."""
+        with self._lock:
+            return [message for turn in self.turns for message in turn]
+
+    def build_messages(self, system_prompt):
+        """Return the messages to send: system prompt, summary and history."""
+        messages = [{"role": "system", "content": system_prompt}]
+        if self.summary:
+            messages.append(
+                {
+                    "role": "system",
+                    "content": "Summary of the earlier conversation:\n"
+                    + self.summary,
+                }
+            )
+        return messages + self.messages()
+
+    def total_tokens(self):
+        return sum(self.turn_tokens)
+
+    def clear(self):
+        with self._lock:
+            self.turns.clear()
+            self.turn_tokens.clear()
+            self.summary = ""
+
+    @staticmethod
+    def _collapse(turn):
+        """Drop tool calls and tool results of a finished turn."""
+        return [
+            message
+            for message in turn
+            if message["role"] != "tool" and not message.get("tool_calls")
+        ]
+
+    def _enforce_budget(self):
+        """Remove the oldest turns until the history fits into the budget."""
+        dropped = []
+        total = sum(self.turn_tokens)
+        while len(self.turns) > 1 and total > self.token_budget:
+            dropped.extend(self.turns.pop(0))
+            total -= self.turn_tokens.pop(0)
+        if dropped:
+            log.debug("Compacting %d messages, %d tokens left", len(dropped), total)
+        return dropped
+
+    def _summarize(self, messages):
+        with self._summary_lock:
+            try:
+                self.summary = self.summarizer(self.summary, messages)
+            except Exception as e:
+                log.error(f"Error summarizing conversation history: {e}")
+                self.summary = extractive_summary(self.summary, messages)
@@ -0,0 +1,136 @@
+import asyncio
+import importlib.util
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.logger import log
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (3.05, 20)
+
+
+class HttpClient:
+    """
+    HTTP client shared by everything in `core`.
+
+    Requests go through one `requests.Session`, which keeps a pool of
+    keep-alive connections per host. The OpenAI and Groq SDKs get a shared
+    `httpx.Client` instead, which speaks HTTP/2 when `h2` is installed.
+    """
+
+    def __init__(
+        self, timeout=DEFAULT_TIMEOUT, pool_connections=10, pool_maxsize=10
+    ):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.pool_maxsize = pool_maxsize
+        self._sdk_client = None
+        self._async_client = None
+        self._sdk_client_lock = threading.Lock()
+        self._warm_up_tasks = set()
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+    def sdk_client(self):
+        """Return the `httpx.Client` shared by the OpenAI and Groq SDKs."""
+        with self._sdk_client_lock:
+            if self._sdk_client is None:
+                import httpx
+
+                http2 = importlib.util.find_spec("h2") is not None
+                self._sdk_client = httpx.Client(
+                    http2=http2,
+                    timeout=httpx.Timeout(60, connect=self.timeout[0]),
+                    limits=httpx.Limits(
+                        max_keepalive_connections=self.pool_maxsize,
+                        keepalive_expiry=120,
+                    ),
+                )
+                log.debug("Created SDK HTTP client (HTTP/2: %s)", http2)
+            return self._sdk_client
+
+    def async_client(self):
+        """
+        Return the `httpx.AsyncClient` used by the asyncio implementation.
+
+        The client is bound to the event loop it is first used in.
+        """
+        with self._sdk_client_lock:
+            if self._async_client is None:
+                import httpx
+
+                self._async_client = httpx.AsyncClient(
+                    http2=importlib.util.find_spec("h2") is not None,
+                    timeout=httpx.Timeout(60, connect=self.timeout[0]),
+                    limits=httpx.Limits(
+                        max_keepalive_connections=self.pool_maxsize,
+                        keepalive_expiry=120,
+                    ),
+                )
+            return self._async_client
+
+    def warm_up(self, *urls, sdk=False):
+        """
+        Open connections to the given hosts in the background.
+
+        The TCP and TLS handshakes then overlap with whatever the caller does
+        next, and the following real request reuses the pooled connection.
+        """
+        client = self.sdk_client() if sdk else self.session
+        for url in urls:
+            threading.Thread(
+                target=self._warm_up, args=(client, url), daemon=True
+            ).start()
+
+    def _warm_up(self, client, url):
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}/"
+        try:
+            client.head(origin, timeout=self.timeout[0])
+            log.debug("Warmed up connection to %s", parts.netloc)
+        except Exception as e:
+            log.debug("Could not warm up connection to %s: %s", parts.netloc, e)
+
+    def warm_up_async(self, *urls):
+        """
+        Open connections of the async client in the background.
+
+        Must be called from the event loop the async client is used in.
+        """
+        loop = asyncio.get_running_loop()
+        for url in urls:
+            task = loop.create_task(self._warm_up_async(url))
+            # Keep a reference, so the task isn't garbage collected early
+            self._warm_up_tasks.add(task)
+            task.add_done_callback(self._warm_up_tasks.discard)
+
+    async def _warm_up_async(self, url):
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}/"
+        try:
+            await self.async_client().head(origin, timeout=self.timeout[0])
+            log.debug("Warmed up async connection to %s", parts.netloc)
+        except Exception as e:
+            log.debug("Could not warm up connection to %s: %s", parts.netloc, e)
+
+
+http_client = HttpClient()
@@ -1,5 +1,10 @@
+import atexit
+import json
 import logging
 import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
 
 
 class LogColors:
@@ -12,47 +17,198 @@ class LogColors:
 
 
 class ColoredFormatter(logging.Formatter):
+    """Formatter that colors the level name, with one format per level."""
+
+    LEVEL_COLORS = {
+        logging.DEBUG: LogColors.DEBUG,
+        logging.INFO: LogColors.INFO,
+        logging.WARNING: LogColors.WARNING,
+        logging.ERROR: LogColors.ERROR,
+        logging.CRITICAL: LogColors.CRITICAL,
+    }
+
+    def __init__(self, fmt="%(levelname)s:%(name)s:%(message)s", datefmt=None):
+        super().__init__(fmt, datefmt)
+        # The colored level names are baked into the formats once
+        self.level_formatters = {
+            level: logging.Formatter(
+                fmt.replace(
+                    "%(levelname)s",
+                    f"{color}{logging.getLevelName(level)}{LogColors.RESET}",
+                ),
+                datefmt,
+            )
+            for level, color in self.LEVEL_COLORS.items()
+        }
+
     def format(self, record):
-        # Get the log level and its corresponding color
-        level_color = {
-            logging.DEBUG: LogColors.DEBUG,
-            logging.INFO: LogColors.INFO,
-            logging.WARNING: LogColors.WARNING,
-            logging.ERROR: LogColors.ERROR,
-            logging.CRITICAL: LogColors.CRITICAL,
-        }.get(record.levelno, LogColors.RESET)
+        formatter = self.level_formatters.get(record.levelno)
+        if formatter is None:
+            return super().format(record)
+        return formatter.format(record)
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as JSON lines with the ID of the current turn."""
+
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "turn": getattr(record, "turn", None),
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TurnFilter(logging.Filter):
+    """
+    Attach the ID of the current turn to every record.
+
+    This runs in the thread that logs, before the record is queued, so the
+    ID is the one of the turn the record belongs to.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.tracer = None
+
+    def filter(self, record):
+        if self.tracer is None:
+            # Imported lazily, because the tracer logs through this module
+            from core.tracing import tracer
+
+            self.tracer = tracer
+        record.turn = self.tracer.turn_id
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only every n-th record of noisy call sites.
+
+    A call site opts in with `extra={"sample": n}`; the records of each call
+    site are counted separately. Records without it are always kept.
+    """
 
-        # Create a colored log level string
-        level_name = f"{level_color}{record.levelname}{LogColors.RESET}"
+    def __init__(self):
+        super().__init__()
+        self.counts = {}
+        self._lock = threading.Lock()
 
-        # Create a new log message with the colored level
-        log_message = super().format(record)
+    def filter(self, record):
+        every = getattr(record, "sample", None)
+        if not every or every <= 1:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            count = self.counts.get(key, 0)
+            self.counts[key] = count + 1
+        return count % every == 0
 
-        # Replace the level name in the log message with the colored version
-        log_message = log_message.replace(record.levelname, level_name)
 
-        return log_message
+class LazyQueueHandler(QueueHandler):
+    """
+    Queue records without formatting them.
+
+    `QueueHandler` formats the message in the logging thread so the record
+    can be pickled. The listener runs in the same process, so the record is
+    queued as is and the message is only built by the writer thread. Mutable
+    arguments may therefore be logged as they are a moment later.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+_listeners = {}
 
 
 def create_logger(name):
-    """Create and configure a custom logger."""
+    """
+    Create and configure a custom logger.
+
+    Records are written by a background thread, so logging never blocks the
+    caller on a slow terminal or file. Calling this again for the same name
+    returns the existing logger.
+
+    Environment variables:
+        LOG_LEVEL: The level of logging to use.
+        LOG_FORMAT: "text" (colored) or "json" (JSON lines) for the console.
+        LOG_FILE: Also write JSON lines to this file.
+    """
     logger = logging.getLogger(name)
+    if name in _listeners:
+        return logger
 
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
     logger.setLevel(LOG_LEVEL)
 
     # Create a console handler
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.DEBUG)  # Set the level for the console handler
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        console_handler.setFormatter(JSONFormatter())
+    else:
+        console_handler.setFormatter(
+            ColoredFormatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        )
+    handlers = [console_handler]
+
+    log_file = os.getenv("LOG_FILE")
+    if log_file:
+        file_handler = logging.FileHandler(log_file, encoding="utf-8")
+        file_handler.setFormatter(JSONFormatter())
+        handlers.append(file_handler)
+
+    queue_handler = LazyQueueHandler(queue.SimpleQueue())
+    _listeners[name] = (queue_handler, _start_listener(queue_handler, handlers))
+
+    # Filters run in the calling thread, only for records above the level
+    logger.addFilter(SamplingFilter())
+    logger.addFilter(TurnFilter())
+    logger.addHandler(queue_handler)
 
-    # Create a colored formatter
-    formatter = ColoredFormatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    console_handler.setFormatter(formatter)
+    return logger
 
-    # Add the console handler to the logger
-    logger.addHandler(console_handler)
 
-    return logger
+def _start_listener(queue_handler, handlers):
+    listener = QueueListener(
+        queue_handler.queue, *handlers, respect_handler_level=True
+    )
+    listener.start()
+    return listener
+
+
+def stop_logging():
+    """Write the queued records and stop the writer threads."""
+    for name in list(_listeners):
+        _, listener = _listeners.pop(name)
+        listener.stop()
+
+
+def _restart_listeners():
+    """
+    Give a forked child its own queue and writer thread.
+
+    The child inherits the queue but not the thread that empties it, so its
+    records would never be written.
+    """
+    for name, (queue_handler, listener) in list(_listeners.items()):
+        queue_handler.queue = queue.SimpleQueue()
+        _listeners[name] = (
+            queue_handler,
+            _start_listener(queue_handler, listener.handlers),
+        )
+
+
+# Write the queued records before the interpreter exits
+atexit.register(stop_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listeners)
 
 
 log = create_logger("APP")
@@ -0,0 +1,191 @@
+import logging
+import math
+import re
+from collections import Counter
+
+from core.logger import log
+from core.tokens import estimate_tokens
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return WORD_PATTERN.findall(text.casefold())
+
+
+def split_passages(text, max_words=80):
+    """Split text into passages of roughly `max_words` words along paragraphs."""
+    passages = []
+    current = []
+    for paragraph in re.split(r"\n\s*\n|\n", text):
+        words = paragraph.split()
+        while words:
+            space = max_words - len(current)
+            if space <= 0:
+                passages.append(" ".join(current))
+                current = []
+                space = max_words
+            current.extend(words[:space])
+            words = words[space:]
+        if len(current) >= max_words // 2:
+            passages.append(" ".join(current))
+            current = []
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+class BM25:
+    """Okapi BM25 ranking over a small in-memory set of documents."""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(tokenize(document)) for document in documents]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = sum(self.lengths) / max(len(self.lengths), 1)
+        document_frequency = Counter()
+        for counts in self.term_counts:
+            document_frequency.update(counts.keys())
+        n = len(documents)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def scores(self, query):
+        terms = tokenize(query)
+        scores = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            score = 0.0
+            relative_length = length / (self.average_length or 1)
+            norm = self.k1 * (1 - self.b + self.b * relative_length)
+            for term in terms:
+                tf = counts.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+
+def compact_search_results(results, query, token_budget=800, passage_words=80):
+    """
+    Keep only the passages of the scraped articles that best match the query.
+
+    Passages are ranked with BM25 and taken in rank order until the token
+    budget is used up. They are returned grouped by article, in their
+    original order.
+    """
+    passages = []
+    for article_index, article in enumerate(results):
+        for passage in split_passages(article.get("content") or "", passage_words):
+            passages.append((article_index, passage))
+    if not passages:
+        return results
+
+    scores = BM25([passage for _, passage in passages]).scores(query)
+    ranking = sorted(range(len(passages)), key=lambda i: scores[i], reverse=True)
+
+    selected = set()
+    used = 0
+    for i in ranking:
+        tokens = estimate_tokens(passages[i][1])
+        if used + tokens > token_budget:
+            continue
+        selected.add(i)
+        used += tokens
+
+    compacted = []
+    for article_index, article in enumerate(results):
+        content = " ... ".join(
+            passage
+            for i, (index, passage) in enumerate(passages)
+            if index == article_index and i in selected
+        )
+        if content:
+            compacted.append(
+                {
+                    "title": article.get("title"),
+                    "url": article.get("url"),
+                    "content": content,
+                }
+            )
+    return compacted
+
+
+def _hour(timestamp):
+    return timestamp[11:16]
+
+
+def summarize_weather(data):
+    """Reduce an hourly Open-Meteo forecast to min/max values and rain windows."""
+    if "error" in data or "hourly" not in data:
+        return data
+
+    hourly = data["hourly"]
+    units = data.get("hourly_units", {})
+    times = hourly.get("time", [])
+    temperatures = hourly.get("temperature_2m", [])
+    precipitation = hourly.get("precipitation", [])
+    valid_temperatures = [t for t in temperatures if t is not None]
+
+    summary = {"date": times[0][:10] if times else None}
+    if valid_temperatures:
+        summary.update(
+            {
+                "temperature_min": min(valid_temperatures),
+                "temperature_max": max(valid_temperatures),
+                "temperature_unit": units.get("temperature_2m"),
+                "temperature_every_3h": {
+                    _hour(time): temperature
+                    for time, temperature in list(zip(times, temperatures))[::3]
+                    if temperature is not None
+                },
+            }
+        )
+
+    windows = []
+    window = None
+    for time, amount in zip(times, precipitation):
+        if amount:
+            if window is None:
+                window = {"from": _hour(time), "to": _hour(time), "amount": 0.0}
+                windows.append(window)
+            window["to"] = _hour(time)
+            window["amount"] = round(window["amount"] + amount, 1)
+        else:
+            window = None
+
+    summary["precipitation_total"] = round(sum(a for a in precipitation if a), 1)
+    summary["precipitation_unit"] = units.get("precipitation")
+    summary["precipitation_windows"] = windows
+    return summary
+
+
+class ResultCompactor:
+    """Shrink tool results before they are added to the conversation history."""
+
+    def __init__(self, token_budget=800, passage_words=80):
+        self.token_budget = token_budget
+        self.passage_words = passage_words
+
+    def compact(self, function_name, parameters, result):
+        if function_name == "websearch" and isinstance(result, list):
+            compacted = compact_search_results(
+                result,
+                parameters.get("keywords", ""),
+                token_budget=self.token_budget,
+                passage_words=self.passage_words,
+            )
+        elif function_name == "get_weather" and isinstance(result, dict):
+            compacted = summarize_weather(result)
+        else:
+            return result
+
+        if log.isEnabledFor(logging.DEBUG):
+            before = estimate_tokens(str(result))
+            after = estimate_tokens(str(compacted))
+            log.debug(
+                "Compacted %s result from %d to %d tokens", function_name, before, after
+            )
+        return compacted
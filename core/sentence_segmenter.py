@@ -0,0 +1,37 @@
+import re
+
+
+class SentenceSegmenter:
+    """Incrementally split streamed text into complete sentences."""
+
+    SENTENCE_END = re.compile(r"(?<=[.!?:;])\s+|\n+")
+
+    def __init__(self, min_length=20):
+        # Very short fragments ("Ok.", "Hm!") are merged with the following
+        # sentence so we don't fire a TTS request for every interjection.
+        self.min_length = min_length
+        self.buffer = ""
+
+    def feed(self, text):
+        """Add streamed text and return the sentences that are complete."""
+        if not text:
+            return []
+        self.buffer += text
+
+        sentences = []
+        start = 0
+        for match in self.SENTENCE_END.finditer(self.buffer):
+            sentence = self.buffer[start : match.start()].strip()
+            if len(sentence) < self.min_length:
+                continue
+            sentences.append(sentence)
+            start = match.end()
+
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        """Return whatever text is left in the buffer."""
+        sentence = self.buffer.strip()
+        self.buffer = ""
+        return [sentence] if sentence else []
@@ -0,0 +1,63 @@
+"""
+Framing of the satellite protocol.
+
+Every message is a frame: a 1-byte type, a 4-byte big-endian payload length
+and the payload.
+
+Client to server:
+    AUDIO      16 kHz mono 16-bit PCM of the current utterance
+    END        The utterance is complete (optional, the server also endpoints)
+    CANCEL     Stop the running response, e.g. on barge-in
+
+Server to client:
+    TRANSCRIPT UTF-8 transcript of the utterance
+    TEXT       UTF-8 sentence of the response
+    SPEECH     Encoded audio (MP3) of the sentence sent before it
+    DONE       The response is complete
+    ERROR      UTF-8 error message
+"""
+
+import struct
+
+AUDIO = 1
+END = 2
+CANCEL = 3
+
+TRANSCRIPT = 10
+TEXT = 11
+SPEECH = 12
+DONE = 13
+ERROR = 14
+
+HEADER = struct.Struct("!BI")
+
+
+class ProtocolError(Exception):
+    pass
+
+
+async def read_frame(reader, max_size):
+    """
+    Read the next frame.
+
+    Returns:
+        tuple[int, bytes] | None: Type and payload, or None when the client
+        closed the connection.
+    """
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except EOFError:
+        return None
+    frame_type, length = HEADER.unpack(header)
+    if length > max_size:
+        raise ProtocolError(f"Frame of {length} bytes exceeds the limit")
+    try:
+        return frame_type, await reader.readexactly(length)
+    except EOFError:
+        return None
+
+
+def write_frame(writer, frame_type, payload=b""):
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    writer.write(HEADER.pack(frame_type, len(payload)) + payload)
@@ -0,0 +1,144 @@
+import asyncio
+import multiprocessing
+import os
+import socket
+
+from core.aio.text_to_speech import AsyncTextToSpeech
+from core.aio.transcriber import AsyncTranscriber
+from core.audio.vad import create_vad
+from core.logger import log, stop_logging
+from core.server import protocol
+from core.server.session import Session, SessionLimits
+from core.tools import Tools
+
+
+class AssistantServer:
+    """
+    Serves many satellite clients from one event loop.
+
+    Every connection gets its own `Session` with an isolated conversation
+    history, while the STT and TTS clients, their connection pools and the
+    tools with their caches are shared. Connections beyond `max_sessions`
+    are rejected.
+    """
+
+    def __init__(
+        self,
+        host="0.0.0.0",
+        port=8765,
+        max_sessions=32,
+        limits=None,
+        stt_backends=("groq",),
+        stt_upload_codec=None,
+        tts_backends=("ttsopenai",),
+        vad_backend="energy",
+    ):
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.limits = limits or SessionLimits()
+        self.transcriber = AsyncTranscriber(
+            backends=stt_backends, upload_codec=stt_upload_codec
+        )
+        self.speech_generator = AsyncTextToSpeech(backends=tts_backends)
+        self.tools = Tools()
+        # Every session creates its own VAD, fail at startup if it can't
+        create_vad(vad_backend)
+        self.vad_backend = vad_backend
+        self.sessions = set()
+
+    async def handle_connection(self, reader, writer):
+        if len(self.sessions) >= self.max_sessions:
+            log.warning("Rejected a connection, the server is full")
+            protocol.write_frame(writer, protocol.ERROR, "Server is full")
+            await writer.drain()
+            writer.close()
+            return
+
+        session = Session(
+            reader,
+            writer,
+            self.transcriber,
+            self.speech_generator,
+            self.tools,
+            self.limits,
+            self.vad_backend,
+        )
+        self.sessions.add(session)
+        try:
+            await session.run()
+        finally:
+            self.sessions.discard(session)
+
+    async def serve(self, sock=None):
+        """Accept connections until cancelled, on `sock` if one is given."""
+        if sock is not None:
+            server = await asyncio.start_server(self.handle_connection, sock=sock)
+        else:
+            server = await asyncio.start_server(
+                self.handle_connection, self.host, self.port
+            )
+        log.info(f"Worker {os.getpid()} listening on {self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+
+def _listen_socket(host, port):
+    """Create a listening socket that other worker processes can share."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    sock.setblocking(False)
+    return sock
+
+
+def _run_worker(server_options):
+    server = AssistantServer(**server_options)
+    sock = None
+    if hasattr(socket, "SO_REUSEPORT"):
+        # The kernel balances new connections across the workers
+        sock = _listen_socket(server.host, server.port)
+    try:
+        asyncio.run(server.serve(sock))
+    except KeyboardInterrupt:
+        pass
+
+
+def _run_worker_process(server_options):
+    try:
+        _run_worker(server_options)
+    finally:
+        # Worker processes exit without running the atexit handlers
+        stop_logging()
+
+
+def run_server(workers=1, **server_options):
+    """
+    Run the server in `workers` processes.
+
+    Each worker has its own event loop, clients and sessions, so a session
+    stays on the worker that accepted it. Multiple workers need
+    SO_REUSEPORT (Linux, BSD, macOS); elsewhere a single worker is used.
+    """
+    if workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        log.warning("SO_REUSEPORT is not supported, running a single worker")
+        workers = 1
+    if workers == 1:
+        _run_worker(server_options)
+        return
+
+    processes = [
+        multiprocessing.Process(target=_run_worker_process, args=(server_options,))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+            process.join()
@@ -0,0 +1,247 @@
+import asyncio
+import io
+import time
+import uuid
+import wave
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from core.aio.chat_assistant import AsyncChatAssistant
+from core.audio.vad import create_vad
+from core.logger import log
+from core.server import protocol
+
+RATE = 16000
+
+
+@dataclass
+class SessionLimits:
+    """Resource limits of a single client session."""
+
+    max_utterance_seconds: float = 15.0
+    max_turns_per_minute: int = 12
+    idle_timeout: float = 300.0
+    history_tokens: int = 2000
+    silence_duration: float = 0.6
+    no_speech_timeout: float = 3.0
+    max_frame_bytes: int = 256 * 1024
+
+
+def pcm_to_wav(pcm, name):
+    """Wrap 16 kHz mono 16-bit PCM in an in-memory WAV file."""
+    buffer = io.BytesIO()
+    buffer.name = name
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(RATE)
+        wav_file.writeframes(pcm)
+    buffer.seek(0)
+    return buffer
+
+
+class Session:
+    """
+    One connected client with its own conversation history.
+
+    Incoming PCM is collected into a preallocated utterance buffer and
+    endpointed with the VAD, unless the client ends the utterance itself.
+    Each utterance is transcribed and answered, and every sentence of the
+    response is sent back as text and as synthesized speech, in order, while
+    the rest is still being generated. The transcriber, speech generator
+    and tools are shared by all sessions of a worker.
+    """
+
+    def __init__(
+        self,
+        reader,
+        writer,
+        transcriber,
+        speech_generator,
+        tools,
+        limits,
+        vad_backend="energy",
+    ):
+        self.id = uuid.uuid4().hex[:8]
+        self.reader = reader
+        self.writer = writer
+        self.transcriber = transcriber
+        self.speech_generator = speech_generator
+        self.limits = limits
+        self.processor = AsyncChatAssistant(tools=tools)
+        self.processor.history.token_budget = limits.history_tokens
+        self.vad = create_vad(vad_backend, rate=RATE)
+
+        self.utterance = bytearray(int(limits.max_utterance_seconds * RATE) * 2)
+        self.turn_times = deque()
+        self.turn = None
+        self.turn_index = 0
+        # Set when the server ended an utterance, until new speech starts
+        self.endpointed = False
+        self._reset_utterance()
+
+    def _reset_utterance(self):
+        self.length = 0
+        self.vad_position = 0
+        self.speech_started = False
+        self.silent_frames = 0
+
+    async def run(self):
+        log.info(f"Session {self.id} connected")
+        try:
+            while True:
+                frame = await asyncio.wait_for(
+                    protocol.read_frame(self.reader, self.limits.max_frame_bytes),
+                    self.limits.idle_timeout,
+                )
+                if frame is None:
+                    break
+                frame_type, payload = frame
+                if frame_type == protocol.AUDIO:
+                    if self._add_audio(payload):
+                        self._end_utterance()
+                        self.endpointed = True
+                elif frame_type == protocol.END:
+                    if self.endpointed and not self.speech_started:
+                        # The server already ended the utterance, only the
+                        # trailing silence is left
+                        self._reset_utterance()
+                    else:
+                        self._end_utterance()
+                    self.endpointed = False
+                elif frame_type == protocol.CANCEL:
+                    self._cancel_turn()
+                else:
+                    raise protocol.ProtocolError(f"Unknown frame type {frame_type}")
+        except asyncio.TimeoutError:
+            log.info(f"Session {self.id} timed out")
+        except protocol.ProtocolError as e:
+            log.warning(f"Session {self.id}: {e}")
+            await self._send(protocol.ERROR, str(e))
+        except ConnectionError:
+            pass
+        finally:
+            self._cancel_turn()
+            self.writer.close()
+            log.info(f"Session {self.id} disconnected")
+
+    def _add_audio(self, pcm):
+        """
+        Append PCM to the utterance and run the VAD on the new frames.
+
+        Returns:
+            bool: True if the utterance is complete.
+        """
+        space = len(self.utterance) - self.length
+        if len(pcm) >= space:
+            self.utterance[self.length :] = pcm[:space]
+            self.length = len(self.utterance)
+            log.warning(f"Session {self.id}: utterance reached the maximum length")
+            return True
+        self.utterance[self.length : self.length + len(pcm)] = pcm
+        self.length += len(pcm)
+
+        frame_bytes = self.vad.frame_size * 2
+        complete = (self.length - self.vad_position) // frame_bytes * frame_bytes
+        if not complete:
+            return False
+        samples = np.frombuffer(
+            self.utterance, dtype=np.int16, count=complete // 2,
+            offset=self.vad_position,
+        )
+        self.vad_position += complete
+        for speech in self.vad.is_speech(samples):
+            if speech:
+                self.speech_started = True
+                self.endpointed = False
+                self.silent_frames = 0
+            else:
+                self.silent_frames += 1
+
+        frame_seconds = self.vad.frame_size / RATE
+        if self.speech_started:
+            return self.silent_frames * frame_seconds > self.limits.silence_duration
+        return self.silent_frames * frame_seconds > self.limits.no_speech_timeout
+
+    def _end_utterance(self):
+        pcm = bytes(self.utterance[: self.length])
+        speech = self.speech_started
+        self._reset_utterance()
+        if not pcm:
+            return
+        if not speech:
+            asyncio.ensure_future(self._send(protocol.ERROR, "No speech detected"))
+            return
+
+        now = time.monotonic()
+        while self.turn_times and now - self.turn_times[0] > 60:
+            self.turn_times.popleft()
+        if len(self.turn_times) >= self.limits.max_turns_per_minute:
+            asyncio.ensure_future(self._send(protocol.ERROR, "Too many requests"))
+            return
+        self.turn_times.append(now)
+
+        # A new utterance replaces the response that is still running
+        self._cancel_turn()
+        self.turn = asyncio.create_task(self.run_turn(pcm))
+
+    def _cancel_turn(self):
+        if self.turn is not None and not self.turn.done():
+            self.turn.cancel()
+
+    async def _send(self, frame_type, payload=b""):
+        protocol.write_frame(self.writer, frame_type, payload)
+        await self.writer.drain()
+
+    async def run_turn(self, pcm):
+        """Transcribe an utterance and stream the response back."""
+        self.turn_index += 1
+        name = f"session_{self.id}_{self.turn_index}.wav"
+        try:
+            text = await self.transcriber.transcribe_async(pcm_to_wav(pcm, name))
+            await self._send(protocol.TRANSCRIPT, text)
+            await self.speak(self.processor.stream_text(text))
+            await self._send(protocol.DONE)
+        except asyncio.CancelledError:
+            log.info(f"Session {self.id}: turn cancelled")
+            raise
+        except ConnectionError:
+            pass
+        except Exception as e:
+            log.error(f"Session {self.id}: error during turn: {e}")
+            await self._send(protocol.ERROR, "Internal error")
+
+    async def speak(self, sentences):
+        """Synthesize sentences concurrently and send them in order."""
+        pending = asyncio.Queue()
+
+        async def synthesize():
+            try:
+                index = 0
+                async for sentence in sentences:
+                    task = asyncio.create_task(
+                        self.speech_generator.synthesize_async(sentence, index)
+                    )
+                    pending.put_nowait((sentence, task))
+                    index += 1
+            finally:
+                await sentences.aclose()
+                pending.put_nowait(None)
+
+        producer = asyncio.create_task(synthesize())
+        try:
+            while (item := await pending.get()) is not None:
+                sentence, task = item
+                audio_data = await task
+                await self._send(protocol.TEXT, sentence)
+                if audio_data:
+                    await self._send(protocol.SPEECH, audio_data)
+            await producer
+        finally:
+            producer.cancel()
+            while not pending.empty():
+                item = pending.get_nowait()
+                if item is not None:
+                    item[1].cancel()
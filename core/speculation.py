@@ -0,0 +1,166 @@
+import json
+import re
+import threading
+import time
+
+from core.backend_stats import BackendStats
+from core.logger import log
+
+WEATHER_PATTERN = re.compile(
+    r"\b(wetter\w*|weather|forecast|regnet|regen|rain\w*|schnee\w*|snow\w*"
+    r"|temperatur\w*|temperature)\b",
+    re.IGNORECASE,
+)
+# A capitalized place name after a preposition, e.g. "in Berlin" or "für Bad Tölz"
+LOCATION_PATTERN = re.compile(
+    r"\b(?:in|im|für|fuer|for|at|bei|near)\s+"
+    r"([A-ZÄÖÜ][\w.-]*(?:[ -](?:am|an der|[A-ZÄÖÜ][\w.-]*))*)"
+)
+# Capitalized words that follow a preposition but aren't places
+NOT_LOCATIONS = {
+    "morgen", "heute", "übermorgen", "abend", "nachmittag", "wochenende",
+    "der", "die", "das", "den", "dem", "meiner", "meinem", "unserer",
+    "tomorrow", "today", "the", "my",
+}
+
+
+def normalize_location(location):
+    """Reduce "Berlin, Deutschland" and " berlin " to the same key."""
+    return " ".join(location.split(",")[0].casefold().split())
+
+
+def match_weather(text):
+    """Return the arguments of a likely `get_weather` call, or None."""
+    if not WEATHER_PATTERN.search(text):
+        return None
+    for match in LOCATION_PATTERN.finditer(text):
+        location = match.group(1).rstrip(".-")
+        if location.split()[0].casefold() not in NOT_LOCATIONS:
+            return {"location": location}
+    return None
+
+
+class Speculation:
+    def __init__(self, future):
+        self.future = future
+        self.started = time.monotonic()
+        self.claimed = False
+
+
+class ToolSpeculator:
+    """
+    Start likely tool calls before the model asks for them.
+
+    Transcripts, partial or final, are matched against cheap local intent
+    patterns. A match starts the tool call right away, and when the model
+    then requests the same call, `claim` hands out the running call instead
+    of starting a new one. Only tools with arguments that can be predicted
+    reliably are speculated; a web search depends on the keywords the model
+    picks.
+
+    At most `max_per_turn` calls are started per turn. Calls that are not
+    claimed within the turn, or within `ttl` seconds, count as wasted, and
+    when most of the recent calls were wasted, speculation is suspended for
+    a while.
+    """
+
+    def __init__(
+        self,
+        tools,
+        executor,
+        max_per_turn=1,
+        ttl=30.0,
+        window=20,
+        max_waste_rate=0.7,
+        min_speculations=5,
+        cooldown=600.0,
+    ):
+        self.tools = tools
+        self.executor = executor
+        self.max_per_turn = max_per_turn
+        self.ttl = ttl
+        self.matchers = {"get_weather": match_weather}
+        self.speculations = {}
+        self.started = 0
+        self.hits = 0
+        self.wasted = 0
+        self.outcomes = BackendStats(
+            window=window,
+            max_error_rate=max_waste_rate,
+            min_requests=min_speculations,
+            cooldown=cooldown,
+        )
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, arguments):
+        if name == "get_weather" and "location" in arguments:
+            return name, normalize_location(arguments["location"])
+        return name, json.dumps(arguments, sort_keys=True)
+
+    def start_turn(self):
+        """Settle the speculation of the previous turn."""
+        with self._lock:
+            self._settle(lambda speculation: True)
+
+    def observe(self, text):
+        """Start the tool calls that `text` likely leads to."""
+        if not self.outcomes.is_healthy():
+            return
+        functions = self.tools.available_tools()
+        for name, matcher in self.matchers.items():
+            arguments = matcher(text)
+            if arguments is None:
+                continue
+            key = self._key(name, arguments)
+            with self._lock:
+                now = time.monotonic()
+                self._settle(lambda speculation: now - speculation.started > self.ttl)
+                if key in self.speculations:
+                    continue
+                if len(self.speculations) >= self.max_per_turn:
+                    return
+                log.debug("Speculatively calling %s with %s", name, arguments)
+                self.speculations[key] = Speculation(
+                    self.executor.submit(functions[name], arguments)
+                )
+                self.started += 1
+
+    def claim(self, name, arguments):
+        """
+        Return a function that waits for the speculative call matching
+        `name` and `arguments`, or None if there is none.
+        """
+        with self._lock:
+            speculation = self.speculations.get(self._key(name, arguments))
+            if speculation is None or speculation.claimed:
+                return None
+            speculation.claimed = True
+            self.hits += 1
+        self.outcomes.record(time.monotonic() - speculation.started, True)
+        log.info(f"Using speculative result of {name}")
+        return lambda _: speculation.future.result()
+
+    def _settle(self, expired):
+        """Forget expired speculations and count the unclaimed ones as wasted."""
+        for key, speculation in list(self.speculations.items()):
+            if not expired(speculation):
+                continue
+            del self.speculations[key]
+            if not speculation.claimed:
+                speculation.future.cancel()
+                self.wasted += 1
+                self.outcomes.record(0.0, False)
+                log.info(
+                    f"Speculative {key[0]} call was not used "
+                    f"({self.hits} used, {self.wasted} wasted so far)"
+                )
+
+    def stats(self):
+        return {
+            "started": self.started,
+            "hits": self.hits,
+            "wasted": self.wasted,
+            "pending": len(self.speculations),
+            "suspended": not self.outcomes.is_healthy(),
+        }
@@ -0,0 +1,104 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.logger import log
+from core.tracing import tracer
+
+
+class SpeechStream:
+    """
+    Synthesize sentences as they arrive and play them back in order.
+
+    Sentences are synthesized and decoded concurrently while a playback
+    thread plays the finished audio in the order the sentences were queued,
+    so the first sentence can be heard while the rest of the reply is still
+    generated. Audio stays in memory and is sent to the device as PCM.
+    """
+
+    _END = object()
+
+    def __init__(self, speech_generator, player, max_workers=2):
+        self.speech_generator = speech_generator
+        self.player = player
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.pending = queue.Queue()
+        self.index = 0
+        self.done = threading.Event()
+        self.cancelled = threading.Event()
+        self.playback = None
+        self.playback_thread = threading.Thread(
+            target=self._playback_loop, daemon=True
+        )
+        self.playback_thread.start()
+
+    def put(self, sentence):
+        """Queue a sentence for synthesis and playback."""
+        if self.cancelled.is_set():
+            return
+        log.debug("Queueing sentence %d: %.30s...", self.index, sentence)
+        future = self.executor.submit(self._synthesize, sentence, self.index)
+        self.pending.put(future)
+        self.index += 1
+
+    def _synthesize(self, sentence, index):
+        audio_data = self.speech_generator.synthesize(sentence, index)
+        if audio_data is None:
+            return None
+        return self.player.decode(audio_data)
+
+    def close(self):
+        """Signal that no more sentences will be queued."""
+        self.pending.put(self._END)
+        self.executor.shutdown(wait=False)
+
+    def cancel(self):
+        """Stop playback and drop every sentence that has not been played yet."""
+        log.info("Cancelling speech output")
+        self.cancelled.set()
+        if self.playback:
+            self.playback.stop()
+        self.pending.put(self._END)
+
+    def is_playing(self):
+        return not self.done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until all queued sentences were played. Returns False on timeout."""
+        return self.done.wait(timeout)
+
+    def stop(self):
+        self.cancel()
+
+    def _playback_loop(self):
+        first = True
+        try:
+            while True:
+                future = self.pending.get()
+                if future is self._END:
+                    break
+                if self.cancelled.is_set():
+                    future.cancel()
+                    continue
+                try:
+                    audio = future.result()
+                except Exception as e:
+                    log.error(f"Error generating speech: {e}")
+                    continue
+                if audio is None:
+                    continue
+
+                self.playback = self.player.play_segment(audio)
+                if first:
+                    tracer.mark("playback_start")
+                    first = False
+                if self.cancelled.is_set():
+                    self.playback.stop()
+                self.playback.wait()
+        finally:
+            # Drain whatever was queued after a cancellation
+            while not self.pending.empty():
+                future = self.pending.get_nowait()
+                if future is not self._END:
+                    future.cancel()
+            self.done.set()
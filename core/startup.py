@@ -0,0 +1,26 @@
+import time
+
+from core.logger import log
+
+
+class StartupTimer:
+    """Measure how long each phase of the startup takes."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.phases = []
+
+    def mark(self, phase):
+        """Record the time spent since the previous mark as `phase`."""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        """Log the timing breakdown of all recorded phases."""
+        total = self.last - self.start
+        log.info(f"Startup finished in {total:.2f}s")
+        for phase, duration in self.phases:
+            share = duration / total * 100 if total else 0
+            log.info(f"  {phase:<20} {duration:6.2f}s ({share:4.1f}%)")
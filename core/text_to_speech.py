@@ -1,40 +1,147 @@
 import os
 import re
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-import requests
-from elevenlabs import save
-from elevenlabs.client import ElevenLabs
-from pydub import AudioSegment
-
+from core.http_client import http_client
 from core.logger import log
+from core.tracing import tracer
+from core.tts_cache import TTSCache
+from core.tts_router import (
+    CoquiBackend,
+    ElevenLabsBackend,
+    TTSOpenAIBackend,
+    TTSRouter,
+)
 
 
 class TextToSpeech:
-    def __init__(self, output_folder="recordings"):
+    TTSOPENAI_URL = "https://api.ttsopenai.com/api/v1/public/text-to-speech-stream"
+    TTSOPENAI_HEADERS = {
+        "accept": "application/json",
+        "accept-language": "de-DE,de;q=0.7",
+        "authorization": "",  # Add your authorization token here
+        "content-type": "application/json",
+        "origin": "https://ttsopenai.com",
+        "priority": "u=1, i",
+        "referer": "https://ttsopenai.com/",
+        "sec-ch-ua": '"Not)A;Brand";v="99", "Brave";v="127", "Chromium";v="127"',
+        "sec-ch-ua-mobile": "?0",
+        "sec-ch-ua-platform": '"Windows"',
+        "sec-fetch-dest": "empty",
+        "sec-fetch-mode": "cors",
+        "sec-fetch-site": "same-site",
+        "sec-gpc": "1",
+        "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36",
+    }
+    TTSOPENAI_PAYLOAD = {"model": "tts-1", "speed": 1, "voice_id": "OA005"}
+    COQUI_URL = "https://tts.nc6.conexo.support/api/v1/audio/speech/"
+
+    backend_classes = {
+        "ttsopenai": TTSOpenAIBackend,
+        "elevenlabs": ElevenLabsBackend,
+        "coqui": CoquiBackend,
+    }
+
+    def __init__(
+        self,
+        output_folder="recordings",
+        cache=None,
+        backends=("ttsopenai",),
+        hedge_after=None,
+    ):
+        """
+        Parameters:
+            backends (Iterable[str]): Names of the backends to use, in order of
+                preference. Later backends are used when earlier ones fail.
+            hedge_after (float | None): Seconds after which a slow request is
+                also sent to the next backend. None disables hedging.
+        """
         self.ELVEN_LABS_VOICE_ID = "cgSgspJ2msm6clMCkdW9"
-        self.client = ElevenLabs()
+        self._client = None
+        self.cache = cache or TTSCache()
         self.output_folder = output_folder
         os.makedirs(self.output_folder, exist_ok=True)  # Ensure output folder exists
+        self.router = TTSRouter(
+            [self.backend_classes[name](self) for name in backends],
+            hedge_after=hedge_after,
+        )
         log.info(f"Initialized TextToSpeech with output folder: {self.output_folder}")
 
+    def warm_up(self):
+        """Open connections to the TTS hosts ahead of the first request."""
+        for backend in self.router.candidates():
+            backend.warm_up()
+
+    def warm_up_ttsopenai(self):
+        http_client.warm_up(self.TTSOPENAI_URL)
+
+    def warm_up_coqui(self):
+        http_client.warm_up(self.COQUI_URL)
+
+    def warm_up_cache(self, phrases):
+        """Synthesize common phrases in the background, so they play instantly."""
+
+        def synthesize():
+            for phrase in phrases:
+                self.synthesize(phrase)
+
+        threading.Thread(target=synthesize, daemon=True).start()
+
+    def synthesize(self, text, index=0):
+        """
+        Synthesize text with the first healthy backend that succeeds.
+
+        Returns:
+            bytes | None: The encoded audio, or None if every backend failed.
+        """
+        with tracer.span("tts"):
+            audio_data = self.router.synthesize(text, index)
+        if index == 0:
+            tracer.mark("tts_first_audio")
+        return audio_data
+
+    @property
+    def client(self):
+        """The ElevenLabs client, created on first use."""
+        if self._client is None:
+            from elevenlabs.client import ElevenLabs
+
+            self._client = ElevenLabs()
+        return self._client
+
+    def synthesize_elevenlabs(self, text):
+        """Synthesize text with ElevenLabs, using the cache first."""
+        model = "eleven_turbo_v2_5"
+        key = self.cache.key("elevenlabs", self.ELVEN_LABS_VOICE_ID, model, text)
+        audio_data = self.cache.get(key)
+        if audio_data is None:
+            log.info("Generating speech using ElevenLabs.")
+            response = self.client.generate(
+                text=text, voice=self.ELVEN_LABS_VOICE_ID, model=model
+            )
+            audio_data = b"".join(response)
+            self.cache.put(key, audio_data)
+        return audio_data
+
     def generate_speech(self, text):
         """Generate speech from text using ElevenLabs."""
         speech_file_path = os.path.join(self.output_folder, "speech.mp3")
-        log.info("Generating speech using ElevenLabs.")
-        response = self.client.generate(
-            text=text, voice=self.ELVEN_LABS_VOICE_ID, model="eleven_turbo_v2_5"
-        )
-        save(response, speech_file_path)
+        audio_data = self.synthesize_elevenlabs(text)
+        with open(speech_file_path, "wb") as file:
+            file.write(audio_data)
         log.info(f"Speech generated and saved to {speech_file_path}")
         return speech_file_path
 
-    def generate_speech_coqui(self, text):
-        """Generate speech from text using Coqui TTS."""
-        speech_file_path = Path(self.output_folder) / "speech_coqui.mp3"
-        url = "https://tts.nc6.conexo.support/api/v1/audio/speech/"
+    def synthesize_coqui(self, text):
+        """
+        Synthesize text with Coqui TTS, using the cache first.
+
+        Returns:
+            bytes | None: The encoded audio, or None if generation failed.
+        """
         token = os.getenv("COQUI_TOKEN")
         headers = {
             "Content-Type": "application/json",
@@ -46,70 +153,83 @@ class TextToSpeech:
             "speaker": "german_female_anke.wav",
         }
 
+        key = self.cache.key("coqui", payload["speaker"], payload["language"], text)
+        audio_data = self.cache.get(key)
+        if audio_data is not None:
+            log.info("Coqui TTS speech loaded from cache")
+            return audio_data
+
         log.info("Start generating speech using Coqui TTS")
-        response = requests.post(url, headers=headers, json=payload)
+        response = http_client.post(self.COQUI_URL, headers=headers, json=payload)
 
         if response.status_code == 200:
-            audio_data = response.content
-            with open(speech_file_path, "wb") as file:
-                file.write(audio_data)
-            log.info(f"Coqui TTS speech generated and saved to {speech_file_path}")
-            return speech_file_path
+            self.cache.put(key, response.content)
+            return response.content
         else:
             log.error(
                 f"Coqui TTS failed with status {response.status_code} - {response.text}"
             )
             return None
 
-    def generate_audio_chunk(self, url, headers, payload, chunk, index):
-        """Generate a single audio chunk."""
-        payload["input"] = chunk
-        log.debug(
-            f"Generating audio chunk {index}: {chunk[:30]}..."
-        )  # Log only the first 30 chars
-        response = requests.post(url, headers=headers, json=payload)
+    def generate_speech_coqui(self, text):
+        """Generate speech from text using Coqui TTS."""
+        speech_file_path = Path(self.output_folder) / "speech_coqui.mp3"
+        audio_data = self.synthesize_coqui(text)
+        if audio_data is None:
+            return None
+        with open(speech_file_path, "wb") as file:
+            file.write(audio_data)
+        log.info(f"Coqui TTS speech generated and saved to {speech_file_path}")
+        return speech_file_path
+
+    def _ttsopenai_cache_key(self, text):
+        payload = self.TTSOPENAI_PAYLOAD
+        return self.cache.key("ttsopenai", payload["voice_id"], payload["model"], text)
+
+    def synthesize_ttsopenai(self, text, index=0):
+        """
+        Synthesize text with TTS OpenAI, using the cache first.
+
+        Returns:
+            bytes | None: The encoded audio, or None if generation failed.
+        """
+        key, audio_data = self._ttsopenai_cached(text, index)
+        if audio_data is not None:
+            return audio_data
+
+        response = http_client.post(
+            self.TTSOPENAI_URL,
+            headers=self.TTSOPENAI_HEADERS,
+            json=self._ttsopenai_payload(text, index),
+        )
+        return self._ttsopenai_result(key, index, response)
+
+    def _ttsopenai_cached(self, text, index):
+        """Return the cache key of `text` and its cached audio, or None."""
+        key = self._ttsopenai_cache_key(text)
+        audio_data = self.cache.get(key)
+        if audio_data is not None:
+            log.debug("Chunk %d loaded from cache", index, extra={"sample": 10})
+        return key, audio_data
 
+    def _ttsopenai_payload(self, text, index):
+        log.debug("Generating audio chunk %d: %.30s...", index, text)
+        return {**self.TTSOPENAI_PAYLOAD, "input": text}
+
+    def _ttsopenai_result(self, key, index, response):
+        """Cache and return the audio of a TTS OpenAI response, or None."""
         if response.status_code == 200:
-            temp_file_path = os.path.join(
-                self.output_folder, f"temp_speech_{index}.mp3"
-            )
-            with open(temp_file_path, "wb") as audio_file:
-                audio_file.write(response.content)
-            log.debug(f"Chunk {index} generated and saved to {temp_file_path}")
-            return temp_file_path
+            self.cache.put(key, response.content)
+            return response.content
         else:
             log.error(
                 f"Chunk {index} generation failed with status {response.status_code} - {response.text}"
             )
             return None
 
-    def generate_speech_ttsopenai(self, text):
-        """Generate speech from text using TTS OpenAI."""
-        speech_file_path = os.path.join(self.output_folder, "speech_openai.mp3")
-        temp_audio_files = []  # To hold paths of temporary audio files
-        url = "https://api.ttsopenai.com/api/v1/public/text-to-speech-stream"
-        headers = {
-            "accept": "application/json",
-            "accept-language": "de-DE,de;q=0.7",
-            "authorization": "",  # Add your authorization token here
-            "content-type": "application/json",
-            "origin": "https://ttsopenai.com",
-            "priority": "u=1, i",
-            "referer": "https://ttsopenai.com/",
-            "sec-ch-ua": '"Not)A;Brand";v="99", "Brave";v="127", "Chromium";v="127"',
-            "sec-ch-ua-mobile": "?0",
-            "sec-ch-ua-platform": '"Windows"',
-            "sec-fetch-dest": "empty",
-            "sec-fetch-mode": "cors",
-            "sec-fetch-site": "same-site",
-            "sec-gpc": "1",
-            "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36",
-        }
-        payload = {"model": "tts-1", "speed": 1, "voice_id": "OA005"}
-
-        log.info("Start generating speech")
-        start_time = time.time()
-
+    @staticmethod
+    def split_into_chunks(text, max_length=500):
+        """Split text at sentence boundaries into chunks of at most `max_length`."""
         # Split text into sentences
         sentence_pattern = r"(?<=[.!?]) +"
         sentences = re.split(sentence_pattern, text)
@@ -120,7 +240,7 @@ class TextToSpeech:
 
         for sentence in sentences:
             sentence = sentence.strip()
-            if len(current_chunk) + len(sentence) + 1 <= 500:
+            if len(current_chunk) + len(sentence) + 1 <= max_length:
                 current_chunk += " " + sentence if current_chunk else sentence
             else:
                 if current_chunk:
@@ -129,38 +249,30 @@ class TextToSpeech:
 
         if current_chunk:
             chunks.append(current_chunk)
+        return chunks
 
-        # Generate audio for each chunk and store the temporary file paths
+    def generate_speech_ttsopenai(self, text):
+        """
+        Generate speech from text using TTS OpenAI and save it to a file.
+
+        The chunks are synthesized in parallel and their MP3 streams are
+        concatenated as they are, without decoding and re-encoding. To play
+        speech while it is generated, queue the chunks on a `SpeechStream`.
+        """
+        speech_file_path = os.path.join(self.output_folder, "speech_openai.mp3")
+
+        log.info("Start generating speech")
+        start_time = time.time()
+
+        chunks = self.split_into_chunks(text)
         with ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(
-                    self.generate_audio_chunk, url, headers, payload.copy(), chunk, i
-                ): i
-                for i, chunk in enumerate(chunks)
-            }
-
-            for future in as_completed(futures):
-                index = futures[future]
-                temp_audio_file = future.result()
-                if temp_audio_file:
-                    while len(temp_audio_files) <= index:
-                        temp_audio_files.append(None)
-                    temp_audio_files[index] = temp_audio_file
-
-        # Combine all audio files in the order they were processed
-        combined = AudioSegment.empty()
-        for audio_file in temp_audio_files:
-            if audio_file:
-                combined += AudioSegment.from_file(audio_file)
-
-        # Export the combined audio file
-        combined.export(speech_file_path, format="mp3")
-
-        # Clean up temporary files
-        for audio_file in temp_audio_files:
-            if audio_file and Path(audio_file).exists():
-                Path(audio_file).unlink()
-                log.debug(f"Temporary file {audio_file} deleted.")
+            audio_chunks = executor.map(
+                self.synthesize_ttsopenai, chunks, range(len(chunks))
+            )
+            audio_data = b"".join(chunk for chunk in audio_chunks if chunk)
+
+        with open(speech_file_path, "wb") as file:
+            file.write(audio_data)
 
         end_time = time.time()
         log.info(f"Finished generating speech in {end_time - start_time:.2f}s and saved to {speech_file_path}")
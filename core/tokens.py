@@ -0,0 +1,24 @@
+import functools
+
+# Rough average for English and German text with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def estimate_tokens(text):
+    """Count the tokens of `text`, or estimate them if tiktoken is not installed."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(encoding.encode(text, disallowed_special=()))
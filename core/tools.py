@@ -1,12 +1,21 @@
+import datetime
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import TypedDict
 
 import requests
-from duckduckgo_search import DDGS
-from goose3 import Goose
 
+from core.cache import TTLCache
+from core.http_client import http_client
 from core.logger import log
 
 
+# Bytes read from a scraped page at a time
+SCRAPE_CHUNK_SIZE = 16384
+
+
 class WeatherCoordinatesParams(TypedDict):
     latitude: float
     longitude: float
@@ -30,8 +39,34 @@ class Tools:
         key: str
         function: callable
 
-    def __init__(self, additional_tools: AdditionalTools = {}) -> None:
+    WEATHER_URL = "https://api.open-meteo.com/v1/dwd-icon"
+    GEOCODE_URL = "https://nominatim.openstreetmap.org/search"
+    # Nominatim allows at most one request per second
+    GEOCODE_MIN_INTERVAL = 1.0
+
+    def __init__(
+        self, additional_tools: AdditionalTools = {}, cache_folder="cache"
+    ) -> None:
         self.additional_tools = additional_tools
+        # Coordinates of a place practically never change, so they are kept
+        # on disk for a month. Forecasts are only reused within the same hour.
+        self.geocode_cache = TTLCache(
+            maxsize=1024,
+            ttl=30 * 24 * 3600,
+            path=os.path.join(cache_folder, "geocode.json"),
+        )
+        self.forecast_cache = TTLCache(maxsize=128, ttl=3600)
+        self._geocode_lock = threading.Lock()
+        self._last_geocode_request = 0.0
+
+        # Search clients are created once and reused. Goose isn't thread-safe,
+        # so every scraping worker gets its own instance.
+        self._ddgs = None
+        self._ddgs_lock = threading.Lock()
+        self._goose_local = threading.local()
+        self._scrape_pool = ThreadPoolExecutor(
+            max_workers=4, thread_name_prefix="scrape"
+        )
 
     def available_tools(self) -> dict:
         return {
@@ -87,53 +122,148 @@ class Tools:
             },
         ]
 
-    def websearch(self, params: WebSearchParams, max_results=3):
+    def websearch(self, params: WebSearchParams, max_results=3, deadline=6.0):
         """
         Search the internet for the given keywords.
 
+        The results are scraped concurrently. Whatever has not finished when
+        the deadline passes is dropped, so one slow site can't stall the reply.
+
         Parameters:
             keywords (str): The keywords or text to search for.
             max_results (int): Maximum number of results to return.
+            deadline (float): Overall time budget in seconds.
 
         Returns:
             list: The scraped content with title, URL, and content.
         """
-        self.ddgs = DDGS()
-        self.goose = Goose()
-
+        deadline_at = time.monotonic() + deadline
         log.debug(
-            f"Starting web search with params: {params}, max_results: {max_results}"
-        )
-        results = self.ddgs.text(
-            params["keywords"],
-            max_results=max_results,
-            safesearch="off",
+            "Starting web search with params: %s, max_results: %d", params, max_results
         )
+        with self._ddgs_lock:
+            if self._ddgs is None:
+                from duckduckgo_search import DDGS
+
+                self._ddgs = DDGS()
+            results = self._ddgs.text(
+                params["keywords"],
+                max_results=max_results,
+                safesearch="off",
+            )
+
+        futures = [
+            self._scrape_pool.submit(self._scrape, result["href"], deadline_at)
+            for result in results
+        ]
+        wait(futures, timeout=max(0.0, deadline_at - time.monotonic()))
+
         scraped_content = []
+        for result, future in zip(results, futures):
+            if not future.done():
+                future.cancel()
+                log.warning(f"Skipping {result['href']} - Deadline exceeded")
+            elif future.exception() is not None:
+                log.error(f"Error scraping {result['href']}: {future.exception()}")
+            elif future.result() is not None:
+                scraped_content.append(future.result())
 
-        for result in results:
-            try:
-                log.debug(f"Checking URL: {result['href']}")
-                response = requests.head(result["href"])
-                if response.status_code != 200:
-                    log.warning(
-                        f"Skipping {result['href']} - Received status code: {response.status_code}"
-                    )
-                    continue
-
-                article = self.goose.extract(url=result["href"])
-                scraped_content.append(
-                    {
-                        "title": article.title,
-                        "url": result["href"],
-                        "content": article.cleaned_text,
-                    }
+        return scraped_content
+
+    def _scrape(self, url, deadline_at):
+        """
+        Fetch a page with a single GET and extract the article text.
+
+        The download is abandoned when the deadline passes, so the worker is
+        free again for the next search.
+        """
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            return None
+
+        log.debug("Fetching URL: %s", url, extra={"sample": 5})
+        response = http_client.get(
+            url, timeout=(min(3.05, remaining), remaining), stream=True
+        )
+        try:
+            if response.status_code != 200:
+                log.warning(
+                    f"Skipping {url} - Received status code: {response.status_code}"
                 )
-                log.info(f"Successfully scraped content from: {result['href']}")
-            except Exception as e:
-                log.error(f"Error scraping {result['href']}: {e}")
+                return None
+            body = self._read_body(response, deadline_at)
+        except Exception:
+            if time.monotonic() < deadline_at:
+                raise
+            body = None
+        finally:
+            response.close()
+        if body is None:
+            log.warning(f"Skipping {url} - Deadline exceeded while downloading")
+            return None
 
-        return scraped_content
+        article = self._goose().extract(
+            url=url, raw_html=self._decode(response, body)
+        )
+        log.info("Successfully scraped content from: %s", url)
+        return {
+            "title": article.title,
+            "url": url,
+            "content": article.cleaned_text,
+        }
+
+    @staticmethod
+    def _read_body(response, deadline_at):
+        """
+        Read the body of a streamed response until `deadline_at`.
+
+        The socket timeout is lowered to the remaining time before every
+        read, and every read returns as soon as some data has arrived, so
+        neither a stalled nor a slowly dripping site can hold the worker.
+
+        Returns:
+            bytes | None: The body, or None if the deadline passed first.
+        """
+        raw = response.raw
+        connection = getattr(raw, "connection", None)
+        read = getattr(raw, "read1", raw.read)
+        chunks = []
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                return None
+            if connection is not None and connection.sock is not None:
+                connection.sock.settimeout(remaining)
+            chunk = read(SCRAPE_CHUNK_SIZE, decode_content=True)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    @staticmethod
+    def _decode(response, body):
+        """
+        Decode a page with the charset from its Content-Type header.
+
+        Without one, requests assumes ISO-8859-1 for text/html, which turns
+        UTF-8 pages into mojibake, so the charset is detected instead.
+        """
+        content_type = response.headers.get("Content-Type", "")
+        if "charset" in content_type.lower():
+            encoding = response.encoding
+        else:
+            encoding = requests.compat.chardet.detect(body)["encoding"]
+        try:
+            return body.decode(encoding or "utf-8", errors="replace")
+        except LookupError:
+            return body.decode("utf-8", errors="replace")
+
+    def _goose(self):
+        """Return the Goose extractor of the current worker thread."""
+        if not hasattr(self._goose_local, "goose"):
+            from goose3 import Goose
+
+            self._goose_local.goose = Goose()
+        return self._goose_local.goose
 
     def get_weather(self, params: WeatherCoordinatesParams | WeatherLocationParams):
         lat = ""
@@ -155,7 +285,14 @@ class Tools:
             lon = coordinates["longitude"]
             log.info(f"Coordinates for {location}: lat={lat}, lon={lon}")
 
-        base_url = "https://api.open-meteo.com/v1/dwd-icon"
+        forecast_key = self._forecast_key(lat, lon)
+        cached = self.forecast_cache.get(forecast_key)
+        log.debug("Forecast cache: %s", self.forecast_cache.stats(), extra={"sample": 10})
+        if cached is not None:
+            log.info(f"Using cached forecast for lat={lat}, lon={lon}")
+            return cached
+
+        base_url = self.WEATHER_URL
         hourly_vars = [
             "temperature_2m",
             "precipitation",
@@ -168,7 +305,7 @@ class Tools:
             "forecast_days": 1,  # Get the forecast for the next day
         }
         log.info(f"Sending request to {base_url} with params {params}")
-        response = requests.get(base_url, params=params)
+        response = http_client.get(base_url, params=params)
         if response.status_code == 200:
             log.info(f"Received successful response: {response.status_code}")
             data = response.json()
@@ -182,6 +319,7 @@ class Tools:
                 "timezone_abbreviation",
             ]:
                 data.pop(key, None)
+            self.forecast_cache.set(forecast_key, data)
             return data
         else:
             log.error(
@@ -189,7 +327,42 @@ class Tools:
             )
             return {"error": "Error getting weather data"}
 
+    @staticmethod
+    def _forecast_key(lat, lon):
+        """Cache key for a forecast: rounded coordinates and the current hour."""
+        hour = datetime.datetime.now().strftime("%Y-%m-%dT%H")
+        return f"{round(float(lat), 2)},{round(float(lon), 2)},{hour}"
+
     def _get_coordinates(self, params: CoordinatesParams):
+        """
+        Look up the coordinates of a location, using the geocode cache first.
+
+        Parameters:
+            location (str): The location to search for.
+        Returns:
+            dict: The location data with latitude and longitude.
+        """
+        key = " ".join(params["location"].casefold().split())
+        coordinates = self.geocode_cache.get(key)
+        log.debug("Geocode cache: %s", self.geocode_cache.stats(), extra={"sample": 10})
+        if coordinates is not None:
+            log.info(f"Using cached coordinates for {params['location']}")
+            return coordinates
+
+        coordinates = self._search_coordinates(params)
+        if "error" not in coordinates:
+            self.geocode_cache.set(key, coordinates)
+        return coordinates
+
+    def _throttle_geocode_requests(self):
+        """Wait until the Nominatim rate limit allows another request."""
+        with self._geocode_lock:
+            wait = self._last_geocode_request + self.GEOCODE_MIN_INTERVAL - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_geocode_request = time.time()
+
+    def _search_coordinates(self, params: CoordinatesParams):
         """
         Search for a location using a free-form query.
 
@@ -200,7 +373,7 @@ class Tools:
         """
         try:
             location = params["location"]
-            url = "https://nominatim.openstreetmap.org/search"
+            url = self.GEOCODE_URL
             _params = {"q": location, "format": "jsonv2"}
             headers = {
                 "accept": "application/json",
@@ -222,8 +395,9 @@ class Tools:
                 "referer": "https://www.google.com",
             }
 
+            self._throttle_geocode_requests()
             log.info(f"Sending request to {url} with params {_params}")
-            response = requests.get(
+            response = http_client.get(
                 url, params=_params, allow_redirects=True, headers=headers
             )
             if response.status_code != 200:
@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+from core.logger import log
+
+# Upper bounds of the histogram buckets in seconds
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                break
+        else:
+            i = len(BUCKETS)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Span:
+    """A running span. `mark` records the time to an event inside the span."""
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+        self.marked = set()
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(self.name, time.perf_counter() - self.start)
+        return False
+
+    def mark(self, event):
+        """Record the time from the start of the span to `event`, once."""
+        if event not in self.marked:
+            self.marked.add(event)
+            self.tracer.record(
+                f"{self.name}.{event}", time.perf_counter() - self.start
+            )
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def mark(self, event):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """
+    Per-turn latency tracing.
+
+    Stages are measured with `span` or `record` and tagged with the ID of the
+    current turn, which runs from the wake word to the end of the response.
+    `mark` records the time since the start of the turn, e.g. the time to the
+    first audio. Durations are aggregated into histograms per stage, and at
+    the end of every turn they are exported either as a Prometheus text file
+    (for the node exporter's textfile collector) or appended as JSON lines.
+
+    A disabled tracer returns a shared no-op span and records nothing.
+    """
+
+    def __init__(self, output=None, path=None):
+        """
+        Parameters:
+            output (str | None): "prometheus", "jsonl" or None to disable.
+            path (str | None): File to export to.
+        """
+        if output not in (None, "prometheus", "jsonl"):
+            raise ValueError(f"Unknown trace output: {output}")
+        self.enabled = output is not None
+        self.output = output
+        self.path = path or ("metrics.prom" if output == "prometheus" else "traces.jsonl")
+        self.turn_id = None
+        self.turn_start = None
+        self.histograms = {}
+        self.records = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        output = os.getenv("TRACE_OUTPUT", "").lower() or None
+        return cls(output, os.getenv("TRACE_FILE"))
+
+    def start_turn(self):
+        """
+        Start a new turn and return its ID.
+
+        The ID is also assigned with tracing disabled, so log records can
+        refer to the turn.
+        """
+        self.turn_id = uuid.uuid4().hex[:12]
+        if self.enabled:
+            self.turn_start = time.perf_counter()
+        return self.turn_id
+
+    def end_turn(self):
+        """Record the total turn time and export the metrics."""
+        if not self.enabled or self.turn_id is None:
+            self.turn_id = None
+            return
+        self.mark("turn")
+        try:
+            self.export()
+        except OSError as e:
+            log.error(f"Error exporting traces: {e}")
+        self.turn_id = None
+
+    def span(self, name):
+        """Measure the duration of a `with` block as stage `name`."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name)
+
+    def mark(self, name):
+        """Record the time since the start of the turn as stage `name`."""
+        if not self.enabled or self.turn_start is None:
+            return
+        self.record(name, time.perf_counter() - self.turn_start)
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+            if self.output == "jsonl":
+                self.records.append(
+                    {
+                        "time": time.time(),
+                        "turn": self.turn_id,
+                        "stage": name,
+                        "seconds": round(seconds, 6),
+                    }
+                )
+
+    def export(self):
+        with self._lock:
+            if self.output == "jsonl":
+                records, self.records = self.records, []
+                with open(self.path, "a", encoding="utf-8") as file:
+                    for record in records:
+                        file.write(json.dumps(record) + "\n")
+                return
+            text = self.prometheus_text()
+
+        # Replace the file atomically, so the collector never reads half of it
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(temp_path, self.path)
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP schuai_stage_seconds Latency of the stages of a turn.",
+            "# TYPE schuai_stage_seconds histogram",
+        ]
+        for name, histogram in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+                cumulative += count
+                lines.append(
+                    f'schuai_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'schuai_stage_seconds_sum{{stage="{name}"}} {histogram.sum}')
+            lines.append(
+                f'schuai_stage_seconds_count{{stage="{name}"}} {histogram.count}'
+            )
+        return "\n".join(lines) + "\n"
+
+
+tracer = Tracer.from_env()
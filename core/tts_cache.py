@@ -0,0 +1,102 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+from core.logger import log
+
+
+def normalize_text(text):
+    return " ".join(text.split())
+
+
+class TTSCache:
+    """
+    Content-addressed on-disk cache for synthesized speech.
+
+    Entries are keyed by backend, voice, model and normalized text, and store
+    the encoded audio returned by the backend. The modification time of a
+    file is its last use, and the least recently used files are removed once
+    the cache grows beyond `max_bytes`. The folder is the only state, so
+    several processes can share one cache and its size limit.
+    """
+
+    def __init__(self, folder="cache/tts", max_bytes=50 * 1024 * 1024):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def key(backend, voice, model, text):
+        data = "\0".join([backend, voice, model, normalize_text(text)])
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached audio for `key`, or None."""
+        path = os.path.join(self.folder, key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Store audio for `key` and evict the least recently used entries."""
+        if not data:
+            return
+        path = os.path.join(self.folder, key)
+        fd, temp_path = tempfile.mkstemp(
+            dir=self.folder, prefix=f"{key}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        """
+        Remove the least recently used files until the folder fits into
+        `max_bytes`.
+
+        The size is taken from the folder rather than tracked in memory, so
+        files written by other processes count as well.
+        """
+        entries = []
+        size = 0
+        for entry in os.scandir(self.folder):
+            if not entry.is_file() or entry.name.endswith(".tmp"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.name))
+            size += stat.st_size
+        if size <= self.max_bytes:
+            return
+
+        for _, file_size, name in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except OSError:
+                pass
+            size -= file_size
+            log.debug("Evicted %s from the TTS cache", name)
@@ -0,0 +1,183 @@
+import asyncio
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from core.backend_stats import BackendStats
+from core.logger import log
+from core.tracing import tracer
+
+
+class TTSBackend:
+    """
+    Interface of a speech synthesis backend.
+
+    `synthesize` returns the encoded MP3 audio for a text, or None if the
+    backend failed. Backends wrap the methods of a `TextToSpeech` instance,
+    so they share its cache and configuration.
+    """
+
+    name = None
+
+    def __init__(self, tts):
+        self.tts = tts
+
+    def warm_up(self):
+        """Open a connection to the backend ahead of the first request."""
+
+    def synthesize(self, text, index=0):
+        raise NotImplementedError
+
+    async def synthesize_async(self, text, index=0):
+        return await asyncio.to_thread(self.synthesize, text, index)
+
+
+class TTSOpenAIBackend(TTSBackend):
+    name = "ttsopenai"
+
+    def warm_up(self):
+        self.tts.warm_up_ttsopenai()
+
+    def synthesize(self, text, index=0):
+        return self.tts.synthesize_ttsopenai(text, index)
+
+
+class ElevenLabsBackend(TTSBackend):
+    name = "elevenlabs"
+
+    def synthesize(self, text, index=0):
+        return self.tts.synthesize_elevenlabs(text)
+
+
+class CoquiBackend(TTSBackend):
+    name = "coqui"
+
+    def warm_up(self):
+        self.tts.warm_up_coqui()
+
+    def synthesize(self, text, index=0):
+        return self.tts.synthesize_coqui(text)
+
+
+class TTSRouter:
+    """
+    Send synthesis requests to the first healthy backend, in priority order.
+
+    If a backend fails, the request fails over to the next one. With
+    `hedge_after` set, the next backend is also started when the current one
+    has not answered within that many seconds, and whichever answers first
+    wins. Unhealthy backends are skipped until their cooldown has passed.
+    """
+
+    def __init__(self, backends, hedge_after=None, max_workers=8):
+        if not backends:
+            raise ValueError("At least one TTS backend is required")
+        self.backends = list(backends)
+        self.hedge_after = hedge_after
+        self.stats = {backend.name: BackendStats() for backend in self.backends}
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tts"
+        )
+
+    def candidates(self):
+        """Return the healthy backends, or all of them if none is healthy."""
+        healthy = [
+            backend for backend in self.backends if self.stats[backend.name].is_healthy()
+        ]
+        return healthy or list(self.backends)
+
+    def summary(self):
+        return {name: stats.summary() for name, stats in self.stats.items()}
+
+    def synthesize(self, text, index=0):
+        """Return the audio of the first backend that succeeds, or None."""
+        remaining = self.candidates()
+        running = {}
+
+        def start():
+            backend = remaining.pop(0)
+            future = self.executor.submit(self._call, backend, text, index)
+            running[future] = backend
+
+        start()
+        while running:
+            timeout = self.hedge_after if remaining else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                log.info(f"Chunk {index} is slow, hedging with {remaining[0].name}")
+                start()
+                continue
+            for future in done:
+                del running[future]
+                if future.result():
+                    return future.result()
+            if not running and remaining:
+                start()
+
+        log.error(f"All TTS backends failed for chunk {index}")
+        return None
+
+    async def synthesize_async(self, text, index=0):
+        """asyncio version of `synthesize`. Requests that lose are cancelled."""
+        remaining = self.candidates()
+        running = set()
+
+        def start():
+            backend = remaining.pop(0)
+            running.add(asyncio.create_task(self._call_async(backend, text, index)))
+
+        start()
+        try:
+            while running:
+                timeout = self.hedge_after if remaining else None
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    log.info(f"Chunk {index} is slow, hedging with {remaining[0].name}")
+                    start()
+                    continue
+                for task in done:
+                    running.discard(task)
+                    if task.result():
+                        return task.result()
+                if not running and remaining:
+                    start()
+        finally:
+            for task in running:
+                task.cancel()
+
+        log.error(f"All TTS backends failed for chunk {index}")
+        return None
+
+    def _call(self, backend, text, index):
+        start_time = time.monotonic()
+        try:
+            audio_data = backend.synthesize(text, index)
+        except Exception as e:
+            log.error(f"TTS backend {backend.name} failed: {e}")
+            audio_data = None
+        self._record(backend, time.monotonic() - start_time, audio_data)
+        return audio_data
+
+    async def _call_async(self, backend, text, index):
+        start_time = time.monotonic()
+        try:
+            audio_data = await backend.synthesize_async(text, index)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.error(f"TTS backend {backend.name} failed: {e}")
+            audio_data = None
+        self._record(backend, time.monotonic() - start_time, audio_data)
+        return audio_data
+
+    def _record(self, backend, latency, audio_data):
+        stats = self.stats[backend.name]
+        was_healthy = stats.is_healthy()
+        stats.record(latency, bool(audio_data))
+        tracer.record(f"tts.{backend.name}", latency)
+        if was_healthy and not stats.is_healthy():
+            log.warning(
+                f"TTS backend {backend.name} is unhealthy "
+                f"({stats.error_rate():.0%} errors), skipping it for {stats.cooldown:.0f}s"
+            )
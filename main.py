@@ -1,63 +1,405 @@
+import asyncio
 import os
+import threading
 
-import numpy as np
-from openwakeword import utils
-from openwakeword.model import Model
+from core.startup import StartupTimer
+
+startup_timer = StartupTimer()
 
 from core.audio.audio_player import AudioPlayer
 from core.audio.audio_recorder import AudioRecorder
+from core.audio.incremental_transcription import IncrementalTranscription
 from core.audio.transcriber import Transcriber
+from core.audio.vad import create_vad
+from core.audio.wake_word import WakeWordDetector
 from core.logger import log
 from core.chat_assistant import ChatAssistant
+from core.speech_stream import SpeechStream
 from core.text_to_speech import TextToSpeech
+from core.tracing import tracer
+
+startup_timer.mark("imports")
 
 # Constants
-MODEL_PATH = "alexa"
+# Wake word models and their thresholds, e.g. "alexa:0.5,hey_jarvis:0.6"
+WAKE_WORDS = os.getenv("WAKE_WORDS", "alexa:0.5")
 INFERENCE_FRAMEWORK = "onnx"
+# Higher threshold while the assistant is speaking, so its own voice
+# doesn't trigger the wake word
+BARGE_IN_THRESHOLD = 0.8
+# Codec for uploading recordings to remote STT backends: "flac", "opus" or None
+STT_UPLOAD_CODEC = os.getenv("STT_UPLOAD_CODEC", "wav").lower()
+STT_UPLOAD_CODEC = None if STT_UPLOAD_CODEC == "wav" else STT_UPLOAD_CODEC
+# Voice activity detection of the recorder: "energy" or "webrtc"
+VAD_BACKEND = os.getenv("VAD_BACKEND", "energy").lower()
+# Phrases (one per line) that are synthesized into the TTS cache at startup
+TTS_WARMUP_PHRASES_FILE = "tts_phrases.txt"
 
-# One-time download of all pre-trained models
-utils.download_models()
 
-owwModel = Model(wakeword_models=[MODEL_PATH], inference_framework=INFERENCE_FRAMEWORK)
+def parse_wake_words(value):
+    """Parse "name:threshold,..." into a dict. The threshold defaults to 0.5."""
+    wake_words = {}
+    for entry in value.split(","):
+        name, _, threshold = entry.strip().partition(":")
+        wake_words[name] = float(threshold) if threshold else 0.5
+    return wake_words
 
 
 class ConversationalAssistant:
-    def __init__(self):
-        self.recorder = AudioRecorder()
-        self.player = AudioPlayer()
-        self.transcriber = Transcriber()
+    transcriber_class = Transcriber
+    processor_class = ChatAssistant
+    speech_generator_class = TextToSpeech
+
+    def __init__(
+        self,
+        streaming=True,
+        barge_in=False,
+        incremental_stt=False,
+        speculative_tools=False,
+        startup_timer=None,
+        wake_word=None,
+        recorder=None,
+        player=None,
+    ):
+        """
+        The wake word detector, recorder and player can be passed in to run
+        the assistant without audio devices, e.g. in benchmarks.
+        """
+        self.streaming = streaming
+        self.barge_in = barge_in
+        self.incremental_stt = incremental_stt
+        startup_timer = startup_timer or StartupTimer()
 
-        self.processor = ChatAssistant()
-        self.speech_generator = TextToSpeech()
+        # Only download the configured models, and only if they are missing
+        self.wake_word = wake_word or WakeWordDetector(
+            wake_words=parse_wake_words(WAKE_WORDS),
+            inference_framework=INFERENCE_FRAMEWORK,
+        )
+        startup_timer.mark("wake word model")
+
+        self.recorder = recorder or AudioRecorder(
+            CHUNK=WakeWordDetector.FRAME_SIZE,
+            save_recordings=os.getenv("SAVE_RECORDINGS", "false").lower() == "true",
+            vad=create_vad(VAD_BACKEND),
+        )
+        self.player = player or AudioPlayer()
+        startup_timer.mark("audio devices")
+
+        local_max_seconds = os.getenv("STT_LOCAL_MAX_SECONDS")
+        self.transcriber = self.transcriber_class(
+            backends=os.getenv("STT_BACKENDS", "groq").split(","),
+            local_options={
+                "model_size": os.getenv("STT_LOCAL_MODEL", "base"),
+                "cpu_threads": int(os.getenv("STT_CPU_THREADS", "0")),
+            },
+            local_max_seconds=float(local_max_seconds) if local_max_seconds else None,
+            upload_codec=STT_UPLOAD_CODEC,
+            upload_bitrate=int(os.getenv("STT_UPLOAD_BITRATE", "24000")),
+        )
+        self.processor = self.processor_class(speculative_tools=speculative_tools)
+        hedge_after = os.getenv("TTS_HEDGE_AFTER")
+        self.speech_generator = self.speech_generator_class(
+            backends=os.getenv("TTS_BACKENDS", "ttsopenai").split(","),
+            hedge_after=float(hedge_after) if hedge_after else None,
+        )
+        if os.path.exists(TTS_WARMUP_PHRASES_FILE):
+            with open(TTS_WARMUP_PHRASES_FILE, encoding="utf-8") as file:
+                phrases = [line.strip() for line in file if line.strip()]
+            self.speech_generator.warm_up_cache(phrases)
+        # Thread that generates the streamed response of the current turn
+        self._producer = None
+        startup_timer.mark("clients")
 
     def conversational_mode(self):
         self.recorder.play_beep(100, 300)
         """Handle conversational interactions with advanced features."""
+        interrupted = False
         while True:
-            audio_data = np.frombuffer(self.recorder.read_chunk(), dtype=np.int16)
-            prediction = owwModel.predict(audio_data)
-
-            # Check if any score exceeds 0.5
-            if any(max(score) > 0.5 for score in owwModel.prediction_buffer.values()):
-                output_filename = self.recorder.record_audio()
-                owwModel.reset()
-                transcription_text = self.transcriber.transcribe_file(output_filename)
-                response_text = self.processor.process_text_with_openai(
-                    transcription_text
-                )
-                speech_file_path = self.speech_generator.generate_speech_ttsopenai(
-                    response_text
-                )
-
-                audio_player = self.player.play_audio(speech_file_path)
-                while audio_player.is_playing():
-                    self.recorder.mic_stream.stop_stream()
-                    pass
-                self.recorder.mic_stream.start_stream()
-                os.remove(speech_file_path)
+            if not interrupted:
+                if not self.wake_word.process(self.recorder.read_chunk()):
+                    continue
+
+            self.start_turn()
+            transcription_text = self.listen()
+            if self.streaming:
+                interrupted = self.respond_streaming(transcription_text)
+            else:
+                interrupted = self.respond(transcription_text)
+            tracer.end_turn()
+
+    def start_turn(self):
+        """Start tracing a turn and prepare the connections it needs."""
+        tracer.start_turn()
+        tracer.record("wake_word", self.wake_word.inference_times[-1])
+        if self.processor.speculator is not None:
+            self.processor.speculator.start_turn()
+        self.warm_up_connections()
+
+    def listen(self):
+        """Record the user's request and transcribe it."""
+        if not self.incremental_stt:
+            with tracer.span("recording"):
+                recording = self.recorder.record_audio()
+            self.wake_word.reset()
+            return self.transcriber.transcribe(recording)
+
+        # Transcribe every pause-delimited segment while the user keeps talking
+        transcription = self.transcriber.start_incremental()
+        self.speculate_on_partials(transcription)
+        with tracer.span("recording"):
+            self.recorder.record_audio(on_segment=transcription.add_segment)
+        self.wake_word.reset()
+        with tracer.span("stt.pending"):
+            return transcription.result()
+
+    def speculate_on_partials(self, transcription):
+        """Start likely tool calls from the partial transcripts."""
+        if self.processor.speculator is not None:
+            transcription.on_partial(self.processor.speculator.observe)
+
+    def warm_up_connections(self):
+        """Open connections to the STT, LLM and TTS hosts while the user speaks."""
+        self.transcriber.warm_up()
+        self.processor.warm_up()
+        self.speech_generator.warm_up()
+
+    def respond(self, transcription_text):
+        """
+        Generate the full response, synthesize it and play it back.
+
+        Returns:
+            bool: True if the user interrupted the playback with the wake word.
+        """
+        self.wait_for_producer()
+        response_text = self.processor.process_text_with_openai(transcription_text)
+
+        # Play the first chunk as soon as it is synthesized
+        speech_stream = SpeechStream(self.speech_generator, self.player, max_workers=4)
+        for chunk in self.speech_generator.split_into_chunks(response_text):
+            speech_stream.put(chunk)
+        speech_stream.close()
+        return self.wait_for_playback(speech_stream)
+
+    def respond_streaming(self, transcription_text):
+        """
+        Speak each sentence of the response as soon as it is generated.
+
+        Returns:
+            bool: True if the user interrupted the playback with the wake word.
+        """
+        self.wait_for_producer()
+        speech_stream = SpeechStream(self.speech_generator, self.player)
+        self._producer = threading.Thread(
+            target=self._produce_speech,
+            args=(transcription_text, speech_stream),
+            daemon=True,
+        )
+        self._producer.start()
+        return self.wait_for_playback(speech_stream)
+
+    def wait_for_producer(self):
+        """
+        Wait until an interrupted response has stopped changing the history.
+
+        After a barge-in the producer finishes its current request or tool
+        call in the background, so it must be done before the next turn
+        starts in the history.
+        """
+        if self._producer is not None:
+            self._producer.join()
+            self._producer = None
+
+    def _produce_speech(self, transcription_text, speech_stream):
+        sentences = self.processor.stream_text_with_openai(
+            transcription_text, cancelled=speech_stream.cancelled
+        )
+        try:
+            for sentence in sentences:
+                if speech_stream.cancelled.is_set():
+                    break
+                speech_stream.put(sentence)
+        except Exception as e:
+            log.error(f"Error generating response: {e}")
+        finally:
+            sentences.close()
+            speech_stream.close()
+
+    def wait_for_playback(self, playback):
+        """
+        Block until playback has finished without busy-waiting.
+
+        With barge-in enabled the wake word detector keeps listening at a
+        reduced sensitivity and stops the playback when it fires.
+
+        Returns:
+            bool: True if the playback was interrupted.
+        """
+        if not self.barge_in:
+            self.recorder.pause_capture()
+            playback.wait()
+            self.recorder.resume_capture()
+            return False
+
+        self.wake_word.reset()
+        while playback.is_playing():
+            chunk = self.recorder.read_chunk()
+            if self.wake_word.process(chunk, min_threshold=BARGE_IN_THRESHOLD):
+                log.info("Wake word detected during playback, interrupting")
+                playback.stop()
+                playback.wait()
+                return True
+        return False
+
+
+class AsyncConversationalAssistant(ConversationalAssistant):
+    """
+    asyncio version of the assistant.
+
+    Every turn (STT, LLM, TTS and playback) runs as one task. When the wake
+    word fires again during a turn (with barge-in enabled), the task is
+    cancelled, which aborts all in-flight requests and stops the playback.
+    """
+
+    def __init__(self, **kwargs):
+        # Only imported in asyncio mode, so the sync mode doesn't load the
+        # async clients
+        from core.aio.chat_assistant import AsyncChatAssistant
+        from core.aio.text_to_speech import AsyncTextToSpeech
+        from core.aio.transcriber import AsyncTranscriber
+
+        self.transcriber_class = AsyncTranscriber
+        self.processor_class = AsyncChatAssistant
+        self.speech_generator_class = AsyncTextToSpeech
+        super().__init__(**kwargs)
+
+    def conversational_mode(self):
+        asyncio.run(self.run())
+
+    async def run(self):
+        """Handle conversational interactions with advanced features."""
+        self.recorder.play_beep(100, 300)
+        turn = None
+        while True:
+            turn_running = turn is not None and not turn.done()
+            if turn_running and not self.barge_in:
+                await asyncio.wait({turn})
+                continue
+
+            threshold = BARGE_IN_THRESHOLD if turn_running else None
+            if not await asyncio.to_thread(self._detect_wake_word, threshold):
+                continue
+
+            if turn_running:
+                log.info("Wake word detected during a turn, cancelling it")
+                turn.cancel()
+                await asyncio.gather(turn, return_exceptions=True)
+
+            self.start_turn()
+            with tracer.span("recording"):
+                if self.incremental_stt:
+                    recording = self.transcriber.start_incremental()
+                    self.speculate_on_partials(recording)
+                    await asyncio.to_thread(
+                        self.recorder.record_audio, on_segment=recording.add_segment
+                    )
+                else:
+                    recording = await asyncio.to_thread(self.recorder.record_audio)
+            self.wake_word.reset()
+            turn = asyncio.create_task(self.run_turn(recording))
+
+    def _detect_wake_word(self, min_threshold=None):
+        chunk = self.recorder.read_chunk()
+        return self.wake_word.process(chunk, min_threshold=min_threshold)
+
+    async def run_turn(self, recording):
+        """
+        Transcribe a recording, then speak the response sentence by sentence.
+
+        Parameters:
+            recording (io.BytesIO | IncrementalTranscription): The recording,
+                or its incremental transcription.
+        """
+        if not self.barge_in:
+            self.recorder.pause_capture()
+        try:
+            if isinstance(recording, IncrementalTranscription):
+                with tracer.span("stt.pending"):
+                    text = await asyncio.to_thread(recording.result)
+            else:
+                text = await self.transcriber.transcribe_async(recording)
+            await self.speak(self.processor.stream_text(text))
+        except asyncio.CancelledError:
+            log.info("Turn cancelled")
+            raise
+        except Exception as e:
+            log.error(f"Error during turn: {e}")
+        finally:
+            tracer.end_turn()
+            if not self.barge_in:
+                self.recorder.resume_capture()
+
+    async def speak(self, sentences):
+        """Synthesize sentences concurrently and play them back in order."""
+        pending = asyncio.Queue()
+
+        async def synthesize():
+            try:
+                index = 0
+                async for sentence in sentences:
+                    pending.put_nowait(
+                        asyncio.create_task(self._synthesize(sentence, index))
+                    )
+                    index += 1
+            except Exception as e:
+                log.error(f"Error generating response: {e}")
+            finally:
+                await sentences.aclose()
+                pending.put_nowait(None)
+
+        producer = asyncio.create_task(synthesize())
+        try:
+            first = True
+            while (task := await pending.get()) is not None:
+                audio = await task
+                if audio is not None:
+                    if first:
+                        tracer.mark("playback_start")
+                        first = False
+                    await self._play(audio)
+        finally:
+            producer.cancel()
+            while not pending.empty():
+                task = pending.get_nowait()
+                if task is not None:
+                    task.cancel()
+
+    async def _synthesize(self, sentence, index):
+        """Synthesize a sentence and decode it off the event loop."""
+        audio_data = await self.speech_generator.synthesize_async(sentence, index)
+        if audio_data is None:
+            return None
+        return await asyncio.to_thread(self.player.decode, audio_data)
+
+    async def _play(self, audio):
+        playback = self.player.play_segment(audio)
+        try:
+            await asyncio.to_thread(playback.wait)
+        except asyncio.CancelledError:
+            playback.stop()
+            raise
 
 
 if __name__ == "__main__":
     log.info("Starting Conversational Assistant")
-    assistant = ConversationalAssistant()
+    if os.getenv("ASYNC_MODE", "false").lower() == "true":
+        assistant_class = AsyncConversationalAssistant
+    else:
+        assistant_class = ConversationalAssistant
+    assistant = assistant_class(
+        barge_in=os.getenv("BARGE_IN", "false").lower() == "true",
+        incremental_stt=os.getenv("INCREMENTAL_STT", "false").lower() == "true",
+        speculative_tools=os.getenv("SPECULATIVE_TOOLS", "false").lower() == "true",
+        startup_timer=startup_timer,
+    )
+    startup_timer.report()
     assistant.conversational_mode()
@@ -0,0 +1,24 @@
+import os
+
+from core.logger import log
+from core.server.server import run_server
+from core.server.session import SessionLimits
+
+if __name__ == "__main__":
+    log.info("Starting Assistant Server")
+    upload_codec = os.getenv("STT_UPLOAD_CODEC", "wav").lower()
+    run_server(
+        workers=int(os.getenv("SERVER_WORKERS", "1")),
+        host=os.getenv("SERVER_HOST", "0.0.0.0"),
+        port=int(os.getenv("SERVER_PORT", "8765")),
+        max_sessions=int(os.getenv("SERVER_MAX_SESSIONS", "32")),
+        limits=SessionLimits(
+            max_utterance_seconds=float(os.getenv("SESSION_MAX_UTTERANCE_SECONDS", "15")),
+            max_turns_per_minute=int(os.getenv("SESSION_MAX_TURNS_PER_MINUTE", "12")),
+            idle_timeout=float(os.getenv("SESSION_IDLE_TIMEOUT", "300")),
+        ),
+        stt_backends=os.getenv("STT_BACKENDS", "groq").split(","),
+        stt_upload_codec=None if upload_codec == "wav" else upload_codec,
+        tts_backends=os.getenv("TTS_BACKENDS", "ttsopenai").split(","),
+        vad_backend=os.getenv("VAD_BACKEND", "energy").lower(),
+    )